@@ -0,0 +1,147 @@
+"""
+Benchmark the approximate (IVF) passage index against exact vector search.
+
+Embeds a synthetic text corpus with the production embedder (hashed
+character n-grams, services/embeddings.py): passages mix a shared Zipfian
+background vocabulary with the vocabularies of one or two overlapping
+topics, so clusters are as blurred as in real embeddings. Builds the index
+over most passages, inserts the rest incrementally, then reports recall@k
+against exact search and query latency for a range of nprobe values, and
+the smallest nprobe that reaches each recall target.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_ann --passages 100000 --queries 200 --nlist 0
+"""
+
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from services.embeddings import EMBEDDING_DIM, embed_texts
+from services.ann_index import IVFIndex
+from services.vector_store import VectorStore
+
+SYLLABLES = ["ka", "lo", "mi", "nu", "re", "sa", "ti", "vo", "ze", "pa", "qui", "dro", "fen", "gal", "hor", "bex"]
+RECALL_TARGETS = (0.8, 0.9, 0.95, 0.99)
+
+
+class SyntheticCorpus:
+    """Random words, a Zipfian background distribution and overlapping topic vocabularies."""
+
+    def __init__(self, vocabulary, topics, topic_words, seed=0):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocabulary:
+            words.add("".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        self.words = sorted(words)
+        # Zipf: the background is dominated by a few very common words
+        self.background_weights = [1.0 / (rank + 1) for rank in range(vocabulary)]
+        # Topics draw from the same vocabulary, so they share words
+        self.topics = [self.rng.sample(self.words, topic_words) for _ in range(topics)]
+
+    def _words(self, source, count):
+        return self.rng.choices(source, k=count)
+
+    def passage(self, length):
+        primary = self.rng.choice(self.topics)
+        secondary = self.rng.choice(self.topics)
+        words = (
+            self.rng.choices(self.words, weights=self.background_weights, k=length // 2)
+            + self._words(primary, length * 7 // 20)
+            + self._words(secondary, length - length // 2 - length * 7 // 20)
+        )
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+    def query(self, length):
+        words = self._words(self.rng.choice(self.topics), length - length // 3) + \
+            self.rng.choices(self.words, weights=self.background_weights, k=length // 3)
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+
+def embed(texts, label):
+    started = time.perf_counter()
+    vectors = np.frombuffer(embed_texts(texts), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+    print(f"Embedded {len(texts)} {label} in {time.perf_counter() - started:.1f} s")
+    return vectors
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def timed(fn, queries):
+    results, timings = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(query))
+        timings.append((time.perf_counter() - started) * 1000)
+    return results, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN index benchmark")
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--vocabulary", type=int, default=30000)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--topic-words", type=int, default=150, help="Words per topic vocabulary")
+    parser.add_argument("--passage-words", type=int, default=60)
+    parser.add_argument("--query-words", type=int, default=8)
+    parser.add_argument("--nlist", type=int, default=0, help="Index lists (0 = about sqrt(passages))")
+    parser.add_argument("--inserted", type=float, default=0.02, help="Fraction of passages inserted after the build")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64,128")
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(args.vocabulary, args.topics, args.topic_words)
+    vectors = embed([corpus.passage(args.passage_words) for _ in range(args.passages)], "passages")
+    queries = embed([corpus.query(args.query_words) for _ in range(args.queries)], "queries")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = VectorStore(directory, EMBEDDING_DIM, "bench")
+        store.add([f"{i:040x}" for i in range(args.passages)], vectors)
+        store.save()
+        del vectors
+        matrix = store.vectors
+
+        built = int(args.passages * (1 - args.inserted))
+        index = IVFIndex(EMBEDDING_DIM)
+        started = time.perf_counter()
+        index.build(matrix[:built], args.nlist or None)
+        print(f"Built {index.nlist} lists over {built} passages in {time.perf_counter() - started:.1f} s")
+        started = time.perf_counter()
+        for start in range(built, args.passages, 1000):
+            index.add(matrix[start:min(start + 1000, args.passages)])
+        print(f"Inserted {args.passages - built} passages in batches of 1000: {time.perf_counter() - started:.2f} s")
+
+        index.save(directory)
+        loaded = IVFIndex(EMBEDDING_DIM)
+        started = time.perf_counter()
+        assert loaded.load(directory) and len(loaded) == args.passages
+        print(f"Reloaded index in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        exact, timings = timed(lambda q: {row for row, _ in store.search(q, args.k)}, queries)
+        print(f"Exact search:  p50 {percentile(timings, 0.5):7.2f} ms   p95 {percentile(timings, 0.95):7.2f} ms")
+
+        recalls = []
+        for nprobe in (int(n) for n in args.nprobe.split(",")):
+            found, timings = timed(lambda q: {row for row, _ in loaded.search(matrix, q, args.k, nprobe)}, queries)
+            recall = sum(len(f & e) for f, e in zip(found, exact)) / max(sum(len(e) for e in exact), 1)
+            recalls.append((nprobe, recall, percentile(timings, 0.5)))
+            print(f"nprobe {nprobe:3d}:    p50 {percentile(timings, 0.5):7.2f} ms   p95 {percentile(timings, 0.95):7.2f} ms"
+                  f"   recall@{args.k} {recall:.3f}")
+
+        for target in RECALL_TARGETS:
+            reached = next(((nprobe, p50) for nprobe, recall, p50 in recalls if recall >= target), None)
+            if reached:
+                print(f"recall@{args.k} >= {target}: nprobe {reached[0]} ({reached[1]:.2f} ms p50)")
+            else:
+                print(f"recall@{args.k} >= {target}: not reached with nprobe <= {recalls[-1][0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark knowledge-base retrieval at large corpus sizes.
+
+Builds a synthetic corpus with a Zipf-distributed vocabulary, then compares
+the original linear scan (re-splitting every passage per query) with the
+BM25 inverted index in services/search_index.py, after checking the index
+against exhaustive BM25 scoring of every passage.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_rag --passages 100000 --queries 500
+"""
+
+import math
+import time
+import random
+import argparse
+from collections import Counter
+from services.search_index import InvertedIndex, analyze
+
+COMMON_WORDS = ["the", "to", "and", "a", "of", "you", "i", "is", "in", "it", "for", "can", "your", "with", "my"]
+
+
+def make_vocabulary(size, rng):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return COMMON_WORDS + sorted(words)
+
+
+def make_corpus(passages, vocabulary, rng, length=60):
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    return [" ".join(rng.choices(vocabulary, weights=weights, k=length)) for _ in range(passages)]
+
+
+def linear_scan(corpus, query, k):
+    """The original retrieve_relevant_passages scoring (shared word count)."""
+    query_words = set(query.lower().split())
+    scored = []
+    for doc_id, content in enumerate(corpus):
+        score = len(query_words.intersection(set(content.lower().split())))
+        if score > 0:
+            scored.append((doc_id, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+def exhaustive_bm25(index, corpus, query, k):
+    """Score every passage with BM25, without the index's pruning."""
+    terms = set(analyze(query))
+    average = index.total_length / index.doc_count
+    scored = []
+    for doc_id, content in enumerate(corpus):
+        counts = Counter(analyze(content))
+        norm = index.k1 * (1 - index.b + index.b * index.doc_lengths[doc_id] / average)
+        score = sum(index.idf(t) * (index.k1 + 1) * counts[t] / (counts[t] + norm) for t in terms if counts[t])
+        if score > 0:
+            scored.append((doc_id, score))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:k]
+
+
+def same_ranking(found, expected):
+    return len(found) == len(expected) and all(
+        a[0] == b[0] and math.isclose(a[1], b[1], rel_tol=1e-9) for a, b in zip(found, expected)
+    )
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def time_queries(fn, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label, timings):
+    print(f"  {label:<24} p50 {percentile(timings, 0.5):8.3f} ms   p95 {percentile(timings, 0.95):8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge-base retrieval benchmark")
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--scan-queries", type=int, default=5, help="Queries timed with the slow linear scan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    print(f"Generating {args.passages} passages...")
+    corpus = make_corpus(args.passages, vocabulary, rng)
+
+    started = time.perf_counter()
+    index = InvertedIndex()
+    for passage in corpus:
+        index.add(passage)
+    print(f"Index build: {time.perf_counter() - started:.2f} s, {index.stats()}")
+
+    content_words = vocabulary[len(COMMON_WORDS):len(COMMON_WORDS) + 5000]
+    keyword_queries = [" ".join(rng.sample(content_words, rng.randint(2, 5))) for _ in range(args.queries)]
+    chat_queries = [
+        " ".join(rng.sample(COMMON_WORDS, 3) + rng.sample(content_words, 2)) for _ in range(args.queries)
+    ]
+
+    for query in keyword_queries[:args.scan_queries] + chat_queries[:args.scan_queries]:
+        assert same_ranking(index.search(query, args.k), exhaustive_bm25(index, corpus, query, args.k)), query
+
+    print(f"Latency over {args.passages} passages (k={args.k}):")
+    report("linear scan", time_queries(lambda q: linear_scan(corpus, q, args.k), keyword_queries[:args.scan_queries]))
+    report("index, keyword queries", time_queries(lambda q: index.search(q, args.k), keyword_queries))
+    report("index, chat queries", time_queries(lambda q: index.search(q, args.k), chat_queries))
+
+
+if __name__ == "__main__":
+    main()
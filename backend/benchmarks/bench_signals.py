@@ -0,0 +1,82 @@
+"""
+Benchmark keyword signal detection as the keyword tables grow.
+
+Compares the old per-keyword `keyword in message.lower()` scans with the
+compiled Aho-Corasick matcher in services/signals.py. The matcher's cost per
+message depends on the message length, not on the number of keywords.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_signals --messages 2000
+"""
+
+import time
+import random
+import string
+import argparse
+from services import signals
+from services.signals import KeywordMatcher, signal_matcher
+
+SAMPLE_MESSAGES = [
+    "I have a really strong craving right now and I don't know what to do",
+    "Feeling a bit stressed at work today but still smoke-free",
+    "I slipped yesterday and smoked two cigarettes, I feel terrible",
+    "Day 12! Feeling great and motivated to keep going",
+    "Everything feels hopeless and I want to give up",
+    "Can you remind me of some breathing exercises?",
+]
+
+
+def synthetic_keywords(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 12)))
+        for _ in range(count)
+    ]
+
+
+def naive_match(keywords, message):
+    message_lower = message.lower()
+    return {keyword for keyword in keywords if keyword in message_lower}
+
+
+def signal_matcher_keywords():
+    """The keywords of the built-in tables."""
+    tables = [signals.CRAVING_EXTENDED_KEYWORDS, signals.CRISIS_KEYWORDS]
+    tables += list(signals.INTENSITY_KEYWORDS.values())
+    tables += list(signals.EMOTION_KEYWORDS.values())
+    tables += list(signals.TOPIC_KEYWORDS.values())
+    return {keyword for table in tables for keyword in table}
+
+
+def time_per_message(fn, messages):
+    started = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - started) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword signal detection benchmark")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages scored per measurement")
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="Comma-separated keyword table sizes")
+    args = parser.parse_args()
+
+    messages = [random.choice(SAMPLE_MESSAGES) for _ in range(args.messages)]
+
+    base_keywords = list(signal_matcher_keywords())
+    print(f"Built-in tables: {signal_matcher.size} keywords, "
+          f"{time_per_message(signal_matcher.match, messages):.1f} us/message")
+    print()
+    print(f"{'keywords':>10} {'build ms':>10} {'naive us/msg':>14} {'matcher us/msg':>16}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        keywords = base_keywords + synthetic_keywords(size)
+        started = time.perf_counter()
+        matcher = KeywordMatcher({keyword: {keyword} for keyword in keywords})
+        build_ms = (time.perf_counter() - started) * 1000
+        naive_us = time_per_message(lambda m: naive_match(keywords, m), messages)
+        matcher_us = time_per_message(matcher.match, messages)
+        print(f"{len(keywords):>10} {build_ms:>10.1f} {naive_us:>14.1f} {matcher_us:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark knowledge-base vector search with the memory-mapped float32 matrix.
+
+Saves a store of random unit vectors, then times memory-mapping it back,
+single queries (matrix-vector product + argpartition), batches of queries
+(matrix-matrix product), and the earlier per-row sparse dot product loop.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_vectors --passages 100000 --queries 200
+"""
+
+import time
+import random
+import argparse
+import tempfile
+import numpy as np
+from services.embeddings import EMBEDDING_DIM, embed_sparse, embed_text, embed_texts
+from services.vector_store import VectorStore
+
+QUERIES = [
+    "How do I handle cravings at work?",
+    "I feel stressed and want to smoke",
+    "what helps with nicotine withdrawal headaches",
+    "my friends smoke at parties, how do I say no",
+    "I slipped and had a cigarette yesterday",
+]
+
+
+def sparse_scan(vectors, query, k):
+    """The earlier pure-Python search: a sparse dot product per row."""
+    flat = vectors.ravel().tolist()
+    dim = vectors.shape[1]
+    weights = list(query.items())
+    started = time.perf_counter()
+    scores = []
+    for row, base in enumerate(range(0, len(flat), dim)):
+        score = 0.0
+        for index, weight in weights:
+            score += flat[base + index] * weight
+        if score > 0:
+            scores.append((row, score))
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return (time.perf_counter() - started) * 1000, scores[:k]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector search benchmark")
+    parser.add_argument("--passages", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--scan-queries", type=int, default=2, help="Queries timed with the slow sparse loop")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.passages, EMBEDDING_DIM), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = VectorStore(directory, EMBEDDING_DIM, "bench")
+        store.add([f"{i:040x}" for i in range(args.passages)], vectors)
+        store.save()
+
+        started = time.perf_counter()
+        store = VectorStore(directory, EMBEDDING_DIM, "bench")
+        store.load()
+        print(f"Memory-mapped {args.passages} x {EMBEDDING_DIM} float32 ({vectors.nbytes / 2**20:.0f} MiB) "
+              f"in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        texts = [random.Random(i).choice(QUERIES) + f" {i}" for i in range(args.queries)]
+        query_vectors = np.frombuffer(embed_texts(texts), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        store.search(query_vectors[0], args.k)  # fault the pages in
+
+        timings = []
+        for query in query_vectors:
+            started = time.perf_counter()
+            store.search(query, args.k)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"Single query: p50 {percentile(timings, 0.5):.2f} ms, p95 {percentile(timings, 0.95):.2f} ms")
+
+        started = time.perf_counter()
+        batched = []
+        for start in range(0, len(query_vectors), args.batch):
+            batched.extend(store.search_batch(query_vectors[start:start + args.batch], args.k))
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"Batches of {args.batch}: {elapsed / len(query_vectors):.2f} ms per query")
+        for query, expected in zip(query_vectors, batched):
+            assert [row for row, _ in store.search(query, args.k)] == [row for row, _ in expected]
+
+        for text in texts[:args.scan_queries]:
+            elapsed, scanned = sparse_scan(vectors, embed_sparse(text), args.k)
+            found = store.search(embed_text(text), args.k)
+            assert [row for row, _ in scanned] == [row for row, _ in found]
+            print(f"Sparse per-row loop: {elapsed:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
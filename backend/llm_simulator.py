@@ -0,0 +1,178 @@
+"""
+Local Groq-compatible LLM simulator for load and latency testing.
+
+Speaks the OpenAI/Groq chat-completions protocol (streaming and
+non-streaming) without calling Groq, with configurable latency, error and
+rate-limit injection.
+
+Usage:
+    python llm_simulator.py --port 8001 --ttft-ms 300 --tokens-per-second 250 --rate-limit-rate 0.02
+
+Then point the backend at it:
+    GROQ_BASE_URL=http://localhost:8001 GROQ_API_KEY=simulated python run.py
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_RESPONSES = [
+    "I'm here for you. Cravings usually pass within a few minutes, so try a slow breath in for four counts and out for four. What's going on around you right now?",
+    "You're doing something hard and it's okay to feel this way. Could you drink a glass of water and take a short walk while the urge passes?",
+    "Every craving you ride out makes the next one easier. What usually helps you get through moments like this?",
+]
+
+
+class SimulatorConfig:
+    """Latency and fault-injection settings, read from the environment or CLI."""
+
+    def __init__(self, **overrides):
+        self.ttft_ms = float(os.getenv("SIM_TTFT_MS", "300"))
+        self.ttft_sigma = float(os.getenv("SIM_TTFT_SIGMA", "0.5"))
+        self.tokens_per_second = float(os.getenv("SIM_TOKENS_PER_SECOND", "250"))
+        self.error_rate = float(os.getenv("SIM_ERROR_RATE", "0"))
+        self.rate_limit_rate = float(os.getenv("SIM_RATE_LIMIT_RATE", "0"))
+        self.retry_after_seconds = float(os.getenv("SIM_RETRY_AFTER_SECONDS", "1"))
+        self.requests_per_minute = int(os.getenv("SIM_REQUESTS_PER_MINUTE", "1000"))
+        self.tokens_per_minute = int(os.getenv("SIM_TOKENS_PER_MINUTE", "1000000"))
+        self.mode = os.getenv("SIM_MODE", "canned")  # canned or echo
+        for key, value in overrides.items():
+            if value is not None:
+                setattr(self, key, value)
+
+    def sample_ttft(self):
+        """Time to first token in seconds, log-normally distributed around ttft_ms."""
+        return self.ttft_ms / 1000.0 * random.lognormvariate(0, self.ttft_sigma)
+
+
+config = SimulatorConfig()
+app = FastAPI(title="Groq-compatible LLM simulator")
+_stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+
+def _completion_text(body):
+    if config.mode == "echo":
+        user_messages = [m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "user"]
+        text = user_messages[-1] if user_messages else ""
+    else:
+        text = random.choice(CANNED_RESPONSES)
+    words = text.split(" ")
+    max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or len(words)
+    return [w if i == 0 else " " + w for i, w in enumerate(words[:max_tokens])]
+
+
+def _rate_limit_headers(prompt_tokens):
+    return {
+        "x-ratelimit-limit-requests": str(config.requests_per_minute),
+        "x-ratelimit-remaining-requests": str(random.randint(config.requests_per_minute // 2, config.requests_per_minute)),
+        "x-ratelimit-reset-requests": "60s",
+        "x-ratelimit-limit-tokens": str(config.tokens_per_minute),
+        "x-ratelimit-remaining-tokens": str(max(config.tokens_per_minute - prompt_tokens, 0)),
+        "x-ratelimit-reset-tokens": "60s",
+    }
+
+
+def _error(status, message, error_type, headers=None):
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type}},
+        headers=headers,
+    )
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    _stats["requests"] += 1
+    model = body.get("model", "simulated")
+    prompt_tokens = sum(len((m.get("content") or "").split()) for m in body.get("messages", []))
+
+    roll = random.random()
+    if roll < config.rate_limit_rate:
+        _stats["rate_limited"] += 1
+        return _error(429, "Rate limit reached (simulated)", "rate_limit_exceeded", headers={
+            "retry-after": str(config.retry_after_seconds),
+            **_rate_limit_headers(prompt_tokens),
+        })
+    if roll < config.rate_limit_rate + config.error_rate:
+        _stats["errors"] += 1
+        return _error(503, "Service unavailable (simulated)", "server_error")
+
+    tokens = _completion_text(body)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    headers = _rate_limit_headers(prompt_tokens)
+    token_delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+
+    if body.get("stream"):
+        async def event_stream():
+            await asyncio.sleep(config.sample_ttft())
+            for i, token in enumerate(tokens):
+                delta = {"content": token}
+                if i == 0:
+                    delta["role"] = "assistant"
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_delay)
+            final = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "x_groq": {"id": completion_id, "usage": usage},
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+    await asyncio.sleep(config.sample_ttft() + token_delay * len(tokens))
+    return JSONResponse(headers=headers, content={
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+        "usage": usage,
+    })
+
+
+@app.get("/stats")
+async def simulator_stats():
+    return {**_stats, "config": vars(config)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Groq-compatible LLM simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, help="Median time to first token in milliseconds")
+    parser.add_argument("--ttft-sigma", type=float, help="Log-normal sigma of the time to first token")
+    parser.add_argument("--tokens-per-second", type=float, help="Generation speed after the first token")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests answered with a 503")
+    parser.add_argument("--rate-limit-rate", type=float, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after-seconds", type=float, help="Retry-After sent with simulated 429s")
+    parser.add_argument("--mode", choices=["canned", "echo"], help="Return canned answers or echo the user message")
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_seconds=args.retry_after_seconds,
+        mode=args.mode,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
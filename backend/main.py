@@ -4,8 +4,9 @@ from fastapi.staticfiles import StaticFiles
 import os
 import logging
 from dotenv import load_dotenv
-from routes import query, calm, dashboard, plan, knowledge, craving, user, analytics, voice_chat, game, resources, chat
+from routes import query, calm, dashboard, plan, knowledge, craving, user, analytics, voice_chat, game, resources, chat, llm
 from services.routes import analyzer
+from services import llm_client, document_extraction
 
 # Load environment variables
 load_dotenv()
@@ -45,6 +46,7 @@ app.include_router(analytics.router, prefix="/api", tags=["analytics"])
 app.include_router(voice_chat.router, prefix="/api", tags=["voice_chat"])
 app.include_router(game.router, prefix="/api", tags=["game"])
 app.include_router(resources.router, prefix="/api", tags=["resources"])
+app.include_router(llm.router, prefix="/api", tags=["llm"])
 app.include_router(analyzer.router)
 
 # Create necessary directories
@@ -54,6 +56,16 @@ os.makedirs("data/knowledge_base", exist_ok=True)
 os.makedirs("data/logs", exist_ok=True)
 logger.info("Created necessary data directories")
 
+# Release pooled LLM connections on shutdown
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_client.aclose()
+
+# Stop document extraction worker processes on shutdown
+@app.on_event("shutdown")
+async def stop_document_extraction():
+    document_extraction.shutdown()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -31,4 +31,4 @@ docs = [
 ]
 
 add_documents(docs)
-print("ChromaDB populated with nicotine recovery knowledge base.") 
\ No newline at end of file
+print("Knowledge base populated with nicotine recovery documents.") 
\ No newline at end of file
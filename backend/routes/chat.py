@@ -1,12 +1,25 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from services import chat as chat_service
-from services import groq_service
+from services import groq_service, llm_priority
 from services.voice import synthesize_speech, get_audio_url
+from collections import defaultdict
 from datetime import datetime
+import os
+import json
+import time
+import asyncio
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Batch chat limits: items per request, parallel LLM calls, results buffered per history write
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "5000"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+CHAT_BATCH_FLUSH_SIZE = int(os.getenv("CHAT_BATCH_FLUSH_SIZE", "200"))
 
 class ChatMessage(BaseModel):
     user_id: str
@@ -54,6 +67,185 @@ async def chat_endpoint(msg: ChatMessage):
         "audio_url": audio_url
     }
 
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(msg: ChatMessage):
+    """
+    Stream the chatbot response as Server-Sent Events.
+    Emits a `meta` event with the time to first token, a `token` event per chunk
+    and a final `done` event; both messages are stored once the stream closes.
+    If the model fails, an `error` event replaces `done`. The reply is only
+    stored when the model finished it: after a model error or a client
+    disconnect only the user message is stored.
+    """
+    user_msg = msg.dict()
+    user_msg["timestamp"] = user_msg["timestamp"] or datetime.utcnow().isoformat()
+    user_msg["sender"] = "user"
+
+    context = msg.context or {}
+    context["user_id"] = msg.user_id
+
+    async def event_stream():
+        started = time.perf_counter()
+        ttft_ms = None
+        chunks = []
+        failed = False
+        finished = False
+        try:
+            async for token in groq_service.query_groq_streaming(msg.message, context):
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(f"Chat stream time to first token for {msg.user_id}: {ttft_ms} ms")
+                    yield format_sse("meta", {"ttft_ms": ttft_ms})
+                chunks.append(token)
+                yield format_sse("token", {"text": token})
+            finished = True
+        except Exception as e:
+            logger.error(f"Chat stream failed for {msg.user_id}: {e}")
+            failed = True
+        finally:
+            # The user message is stored even if the client disconnected mid-stream;
+            # a reply cut short by a model error or a disconnect is not stored, so
+            # later history does not build on a truncated answer
+            response_text = groq_service.clean_response("".join(chunks))
+            bot_msg = {
+                "user_id": msg.user_id,
+                "message": response_text,
+                "timestamp": datetime.utcnow().isoformat(),
+                "sender": "bot",
+                "context": context
+            }
+            try:
+                chat_service.save_message(msg.user_id, user_msg)
+                if finished:
+                    chat_service.save_message(msg.user_id, bot_msg)
+            except Exception as e:
+                logger.error(f"Error saving streamed chat for {msg.user_id}: {e}")
+
+        if failed:
+            yield format_sse("error", {
+                "message": "I'm sorry, I encountered an error while processing your request.",
+                "partial": bool(chunks)
+            })
+            return
+
+        yield format_sse("done", {
+            "response": response_text,
+            "timestamp": bot_msg["timestamp"],
+            "ttft_ms": ttft_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class ChatBatchItem(BaseModel):
+    user_id: str
+    message: str
+    context: Dict[str, Any] = {}
+
+class ChatBatchRequest(BaseModel):
+    items: List[ChatBatchItem]
+    concurrency: Optional[int] = None
+
+def flush_batch_messages(pending: Dict[str, List[Dict[str, Any]]]):
+    """Write buffered batch messages with one history write per user."""
+    for user_id, messages in pending.items():
+        try:
+            chat_service.save_messages(user_id, messages)
+        except Exception as e:
+            logger.error(f"Error saving batch chat messages for {user_id}: {e}")
+
+async def run_batch_item(index: int, item: ChatBatchItem):
+    """Answer one batch item; returns the NDJSON result and the messages to store."""
+    context = dict(item.context or {})
+    context["user_id"] = item.user_id
+    user_msg = {
+        "user_id": item.user_id,
+        "message": item.message,
+        "timestamp": datetime.utcnow().isoformat(),
+        "sender": "user",
+        "context": context
+    }
+    try:
+        response_text = await groq_service.query_groq(item.message, context, priority=llm_priority.BULK, raise_errors=True)
+    except Exception as e:
+        # Only the user message is stored; there is no bot reply to record
+        logger.error(f"Batch chat item {index} for {item.user_id} failed: {e}")
+        return {"index": index, "user_id": item.user_id, "error": str(e)}, [user_msg]
+    bot_msg = {
+        "user_id": item.user_id,
+        "message": response_text,
+        "timestamp": datetime.utcnow().isoformat(),
+        "sender": "bot",
+        "context": context
+    }
+    result = {"index": index, "user_id": item.user_id, "response": response_text, "timestamp": bot_msg["timestamp"]}
+    return result, [user_msg, bot_msg]
+
+@router.post("/chat/batch")
+async def chat_batch_endpoint(batch: ChatBatchRequest):
+    """
+    Answer many chat messages in one request.
+    Items run through the normal chat pipeline at bulk priority with bounded
+    concurrency. Results are streamed as NDJSON in completion order (each line
+    carries the item's `index`), followed by a summary line with `"done": true`.
+    History writes are buffered and grouped per user.
+    """
+    if len(batch.items) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {CHAT_BATCH_MAX_ITEMS} items per request")
+    concurrency = max(1, min(batch.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_CONCURRENCY))
+
+    async def result_stream():
+        started = time.perf_counter()
+        queued = iter(enumerate(batch.items))
+        running = set()
+        pending_writes = defaultdict(list)
+        buffered = 0
+        completed = failed = 0
+
+        def start_next():
+            for index, item in queued:
+                running.add(asyncio.ensure_future(run_batch_item(index, item)))
+                if len(running) >= concurrency:
+                    break
+
+        try:
+            start_next()
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.discard(task)
+                    result, messages = task.result()
+                    pending_writes[result["user_id"]].extend(messages)
+                    buffered += len(messages)
+                    completed += 1
+                    failed += "error" in result
+                    yield json.dumps(result) + "\n"
+                start_next()
+                if buffered >= CHAT_BATCH_FLUSH_SIZE:
+                    await asyncio.to_thread(flush_batch_messages, pending_writes)
+                    pending_writes = defaultdict(list)
+                    buffered = 0
+        finally:
+            # Stop outstanding work if the client went away, but keep what finished
+            for task in running:
+                task.cancel()
+            if pending_writes:
+                flush_batch_messages(pending_writes)
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Batch chat finished {completed} items ({failed} failed) in {total_ms} ms")
+        yield json.dumps({"done": True, "completed": completed, "failed": failed, "total_ms": total_ms}) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @router.get("/chat/history/{user_id}")
 async def chat_history(user_id: str):
     """
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from services import llm_client
+
+router = APIRouter()
+
+@router.get("/llm/stats")
+async def llm_stats_endpoint():
+    """
+    Endpoint for inspecting the shared LLM client layer.
+    Returns circuit breaker state, the current concurrency limit and cache counters.
+    """
+    return llm_client.get_stats()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from models import QueryRequest, QueryResponse
 from services import groq_service
+from services.signals import detect_signals
 from services.voice import synthesize_speech, get_audio_url
 import json
 import os
@@ -21,6 +22,7 @@ async def query_endpoint(request: QueryRequest):
         message = request.message
         voice_enabled = request.voice_enabled
         conversation_mode = request.conversation_mode
+        context["conversation_mode"] = conversation_mode
         
         # Get response from Groq RAG
         response = await groq_service.query_groq(message, context)
@@ -76,8 +78,7 @@ def generate_suggested_actions(context, message):
     cravings = context.get("cravings", 5)
     
     # Check if message contains craving keywords
-    craving_keywords = ["craving", "urge", "want to smoke", "need a cigarette", "temptation"]
-    has_craving = any(keyword in message.lower() for keyword in craving_keywords)
+    has_craving = detect_signals(message).craving
     
     # Generate suggested actions based on context and message
     if has_craving or cravings >= 8:
@@ -110,17 +111,7 @@ def generate_follow_up_questions(context, message):
     days_smoke_free = context.get("days_smoke_free", 0)
     
     # Check if message contains specific topics
-    topics = {
-        "craving": ["craving", "urge", "want to smoke", "need a cigarette", "temptation"],
-        "stress": ["stress", "anxious", "worried", "nervous", "overwhelmed"],
-        "motivation": ["motivation", "motivated", "inspired", "encouraged", "determined"],
-        "relapse": ["relapse", "slipped", "failed", "gave in", "smoked"]
-    }
-    
-    detected_topics = []
-    for topic, keywords in topics.items():
-        if any(keyword in message.lower() for keyword in keywords):
-            detected_topics.append(topic)
+    detected_topics = detect_signals(message).topics
     
     # Generate follow-up questions based on detected topics
     if "craving" in detected_topics:
@@ -178,21 +169,8 @@ def detect_emotion(message):
     Returns:
         str: The detected emotion
     """
-    # Simple emotion detection based on keywords
-    emotions = {
-        "happy": ["happy", "joy", "excited", "great", "wonderful", "fantastic", "amazing"],
-        "sad": ["sad", "depressed", "down", "unhappy", "miserable", "terrible", "awful"],
-        "angry": ["angry", "mad", "furious", "annoyed", "irritated", "frustrated"],
-        "anxious": ["anxious", "nervous", "worried", "stressed", "overwhelmed", "panicked"],
-        "calm": ["calm", "relaxed", "peaceful", "serene", "tranquil", "content"]
-    }
-    
-    message_lower = message.lower()
-    for emotion, keywords in emotions.items():
-        if any(keyword in message_lower for keyword in keywords):
-            return emotion
-    
-    return None
+    # Simple emotion detection based on keywords (see services/signals.py)
+    return detect_signals(message).emotion
 
 def detect_craving(message):
     """
@@ -204,38 +182,9 @@ def detect_craving(message):
     Returns:
         tuple: (craving_detected, craving_intensity)
     """
-    # Craving keywords
-    craving_keywords = ["craving", "urge", "want to smoke", "need a cigarette", "temptation"]
-    
-    # Intensity keywords
-    intensity_keywords = {
-        "high": ["really", "very", "extremely", "intense", "strong", "powerful", "overwhelming"],
-        "medium": ["somewhat", "moderate", "fairly", "quite"],
-        "low": ["slight", "mild", "little", "bit"]
-    }
-    
-    message_lower = message.lower()
-    
-    # Check if craving is detected
-    craving_detected = any(keyword in message_lower for keyword in craving_keywords)
-    
-    # Determine intensity if craving is detected
-    craving_intensity = None
-    if craving_detected:
-        # Default to medium intensity
-        craving_intensity = 5
-        
-        # Check for intensity keywords
-        for intensity, keywords in intensity_keywords.items():
-            if any(keyword in message_lower for keyword in keywords):
-                if intensity == "high":
-                    craving_intensity = 8
-                elif intensity == "medium":
-                    craving_intensity = 5
-                elif intensity == "low":
-                    craving_intensity = 3
-    
-    return craving_detected, craving_intensity
+    # Craving and intensity keywords are matched in one pass (see services/signals.py)
+    signals = detect_signals(message)
+    return signals.craving, signals.craving_intensity
 
 def log_query_interaction(user_id, context, message, response, voice_enabled, conversation_mode):
     """
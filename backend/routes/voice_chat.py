@@ -4,6 +4,7 @@ from fastapi.responses import JSONResponse
 from models import VoiceChatRequest, VoiceChatResponse
 from services.voice import synthesize_speech, get_audio_url, synthesize_speech_stream
 from services import groq_service
+from services.signals import detect_signals
 import json
 import os
 from datetime import datetime
@@ -96,8 +97,7 @@ def generate_suggested_actions(context, message):
     cravings = context.get("cravings", 5)
     
     # Check if message contains craving keywords
-    craving_keywords = ["craving", "urge", "want to smoke", "need a cigarette", "temptation"]
-    has_craving = any(keyword in message.lower() for keyword in craving_keywords)
+    has_craving = detect_signals(message).craving
     
     # Generate suggested actions based on context and message
     if has_craving or cravings >= 8:
@@ -130,17 +130,7 @@ def generate_follow_up_questions(context, message):
     days_smoke_free = context.get("days_smoke_free", 0)
     
     # Check if message contains specific topics
-    topics = {
-        "craving": ["craving", "urge", "want to smoke", "need a cigarette", "temptation"],
-        "stress": ["stress", "anxious", "worried", "nervous", "overwhelmed"],
-        "motivation": ["motivation", "motivated", "inspired", "encouraged", "determined"],
-        "relapse": ["relapse", "slipped", "failed", "gave in", "smoked"]
-    }
-    
-    detected_topics = []
-    for topic, keywords in topics.items():
-        if any(keyword in message.lower() for keyword in keywords):
-            detected_topics.append(topic)
+    detected_topics = detect_signals(message).topics
     
     # Generate follow-up questions based on detected topics
     if "craving" in detected_topics:
@@ -0,0 +1,124 @@
+"""
+Content-addressed disk cache for document analysis results.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus the analysis
+version (model and prompt), stored as one JSON file per entry and evicted
+least-recently-used first once the directory exceeds its size limit.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from services.atomic_files import write_atomic
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(BACKEND_DIR, "data", "analysis_cache"))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+
+def make_content_key(content, version):
+    """
+    Build the cache key for an uploaded document.
+
+    Args:
+        content (bytes): The raw uploaded file
+        version (str): Identifies the model and prompt that produced the analysis
+
+    Returns:
+        str: Hex digest naming the cache entry
+    """
+    return make_digest_key(hashlib.sha256(content).hexdigest(), version)
+
+
+def make_digest_key(content_sha256, version):
+    """Build the cache key from the SHA-256 hex digest of an upload (see make_content_key)."""
+    return hashlib.sha256(f"{content_sha256}:{version}".encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Size-bounded JSON file cache; file mtimes record recency of use."""
+
+    def __init__(self, directory=ANALYSIS_CACHE_DIR, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Discarding unreadable analysis cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.max_bytes <= 0:
+            return
+        try:
+            write_atomic(self._path(key), lambda f: json.dump(value, f))
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Error writing analysis cache entry {key}: {e}")
+            return
+        self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache instance used by services/routes/analyzer.py
+analysis_cache = AnalysisCache()
@@ -0,0 +1,184 @@
+"""
+Approximate nearest-neighbour search over the passage vector matrix.
+
+An inverted-file (IVF) index: spherical k-means splits the passages into
+`nlist` clusters, and each passage is listed under its nearest centroid. A
+query is compared with the centroids, and only the passages listed under
+the `nprobe` closest ones are scored exactly against the memory-mapped
+float32 matrix. nprobe is the recall-versus-latency knob: probing more
+lists finds more of the true nearest neighbours and reads more rows.
+
+Passages inserted after the lists were last sorted are kept in a small
+tail that is filtered by cluster at query time, so inserts only cost one
+centroid assignment each.
+"""
+
+import os
+import json
+import logging
+from services.atomic_files import write_atomic
+
+# NumPy is required for vector search (install it: pip install numpy)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "32"))
+ANN_TRAIN_ITERATIONS = 10
+ANN_TRAIN_POINTS_PER_LIST = 64
+ANN_ASSIGN_BLOCK_ROWS = 65536
+ANN_TAIL_FRACTION = 0.05
+
+
+def default_nlist(count):
+    """About sqrt(count) lists, so a probe reads about sqrt(count) rows."""
+    return max(1, int(round(count ** 0.5)))
+
+
+def _nearest_centroids(vectors, centroids):
+    """Index of the most similar centroid for each row, computed in blocks."""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ANN_ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ANN_ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """Inverted-file index of row numbers of a vector matrix."""
+
+    def __init__(self, dim, nprobe=ANN_NPROBE):
+        if np is None:
+            raise RuntimeError("NumPy not installed. Cannot build the ANN index.")
+        self.dim = dim
+        self.nprobe = nprobe
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.fingerprint = None
+        self._sorted_count = 0
+        self._order = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def build(self, vectors, nlist=None, seed=0):
+        """
+        Train the centroids on a sample of the rows and list every row.
+
+        Args:
+            vectors (ndarray): n x dim float32 matrix of unit vectors
+            nlist (int): Number of clusters (default: about sqrt(n))
+            seed (int): Seed for sampling and initialization
+        """
+        count = len(vectors)
+        nlist = min(nlist or default_nlist(count), count)
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, nlist * ANN_TRAIN_POINTS_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))], dtype=np.float32)
+
+        # Spherical k-means: assign by cosine similarity, centroids are normalized means
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(ANN_TRAIN_ITERATIONS):
+            assignments = _nearest_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            sizes = np.bincount(assignments, minlength=nlist)
+            empty = np.flatnonzero(sizes == 0)
+            # Restart empty clusters from random sample points
+            sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1)
+
+        self.centroids = centroids.astype(np.float32)
+        self.assignments = _nearest_centroids(vectors, self.centroids)
+        self._sort_lists()
+
+    def add(self, vectors):
+        """List new rows, numbered after the rows already indexed."""
+        if len(vectors):
+            self.assignments = np.concatenate([self.assignments, _nearest_centroids(vectors, self.centroids)])
+        if len(self) - self._sorted_count > max(1024, ANN_TAIL_FRACTION * len(self)):
+            self._sort_lists()
+
+    def _sort_lists(self):
+        """Group row numbers by list: the rows of list c are _order[_offsets[c]:_offsets[c + 1]]."""
+        self._order = np.argsort(self.assignments, kind="stable")
+        self._offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.assignments, minlength=self.nlist), out=self._offsets[1:])
+        self._sorted_count = len(self.assignments)
+
+    def search(self, vectors, query, k=3, nprobe=None):
+        """
+        Find approximately the k rows most similar to a query.
+
+        Args:
+            vectors (ndarray): The matrix the index was built over
+            query (ndarray): Query vector of length dim
+            k (int): Number of rows to return
+            nprobe (int): Lists to scan (default: self.nprobe)
+
+        Returns:
+            list: (row, score) tuples, best first, only rows with score > 0
+        """
+        if k <= 0 or not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        candidates = [self._order[self._offsets[c]:self._offsets[c + 1]] for c in probes]
+        if self._sorted_count < len(self):
+            tail = np.arange(self._sorted_count, len(self))
+            candidates.append(tail[np.isin(self.assignments[self._sorted_count:], probes)])
+        # Sorted row numbers read the memory-mapped matrix front to back
+        rows = np.sort(np.concatenate(candidates))
+        if not len(rows):
+            return []
+        scores = np.asarray(vectors[rows], dtype=np.float32) @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((rows[top], -scores[top]))]
+        return [(int(rows[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+    def save(self, directory):
+        """Write the centroids, the row assignments and the metadata atomically."""
+        write_atomic(os.path.join(directory, "ann.centroids.npy"), lambda f: np.save(f, self.centroids), "wb")
+        write_atomic(os.path.join(directory, "ann.assignments.npy"), lambda f: np.save(f, self.assignments), "wb")
+        metadata = {"dim": self.dim, "nlist": self.nlist, "count": len(self), "fingerprint": self.fingerprint}
+        write_atomic(os.path.join(directory, "ann.json"), lambda f: json.dump(metadata, f))
+
+    def load(self, directory):
+        """
+        Load a saved index.
+
+        Returns:
+            bool: True if an index with matching dimensions was loaded
+        """
+        try:
+            with open(os.path.join(directory, "ann.json"), "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            if metadata.get("dim") != self.dim:
+                return False
+            centroids = np.load(os.path.join(directory, "ann.centroids.npy"))
+            assignments = np.load(os.path.join(directory, "ann.assignments.npy"))
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable ANN index in {directory}: {e}")
+            return False
+        if centroids.shape != (metadata.get("nlist"), self.dim) or len(assignments) != metadata.get("count"):
+            logger.warning(f"Discarding ANN index in {directory}: metadata does not match its arrays")
+            return False
+        self.centroids = centroids.astype(np.float32, copy=False)
+        self.assignments = assignments.astype(np.int32, copy=False)
+        self.fingerprint = metadata.get("fingerprint")
+        self._sort_lists()
+        return True
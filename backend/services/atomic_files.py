@@ -0,0 +1,37 @@
+"""
+Atomic file writes for caches, sessions and indexes on disk.
+
+The content is written to a temporary file in the target directory and moved
+into place with os.replace, so readers see either the old file or the new
+one, never a partial write.
+"""
+
+import os
+import tempfile
+
+
+def write_atomic(path, write, mode="w"):
+    """
+    Write a file atomically.
+
+    Args:
+        path (str): Destination path; its directory is created if needed
+        write (callable): Called with the open temporary file to write the content
+        mode (str): "w" for UTF-8 text or "wb" for bytes
+
+    Raises:
+        Whatever write or the file system raises; the temporary file is removed first
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -21,6 +21,10 @@ def get_history_path(user_id: str) -> str:
     return os.path.join(CHAT_HISTORY_DIR, f"{user_id}.json")
 
 def save_message(user_id: str, message: Dict[str, Any]):
+    save_messages(user_id, [message])
+
+def save_messages(user_id: str, messages: List[Dict[str, Any]]):
+    """Append several messages to a user's history with a single read and write."""
     try:
         # Ensure directory exists
         os.makedirs(CHAT_HISTORY_DIR, exist_ok=True)
@@ -36,14 +40,14 @@ def save_message(user_id: str, message: Dict[str, Any]):
                 logger.warning(f"Invalid JSON in {path}, starting with empty history")
                 history = []
         
-        history.append(message)
+        history.extend(messages)
         
         with open(path, "w", encoding="utf-8") as f:
             json.dump(history, f, indent=2)
         
-        logger.info(f"Saved message for user {user_id}")
+        logger.info(f"Saved {len(messages)} message(s) for user {user_id}")
     except Exception as e:
-        logger.error(f"Error saving message for user {user_id}: {e}")
+        logger.error(f"Error saving messages for user {user_id}: {e}")
         raise
 
 def get_history(user_id: str) -> List[Dict[str, Any]]:
@@ -1,9 +1,13 @@
 import os
 import json
 import re
+import asyncio
+import hashlib
 import logging
 from dotenv import load_dotenv
-from groq import Groq
+from services import llm_client, llm_priority
+from services.prompt_budget import count_tokens
+from services.json_stream import IncrementalJSONParser
 
 load_dotenv()
 
@@ -14,44 +18,63 @@ logger = logging.getLogger(__name__)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
 
-# Initialize the Groq client for document analysis
-try:
-    if GROQ_API_KEY:
-        client_analyzer = Groq(
-            api_key=GROQ_API_KEY,
-        )
-        MODEL_ANALYZER_OK = True
-        logger.info(f"Successfully initialized Groq analyzer client with model: {GROQ_MODEL}")
-    else:
-        logger.error("GROQ_API_KEY not found in environment variables")
-        client_analyzer = None
-        MODEL_ANALYZER_OK = False
-except Exception as e:
-    logger.error(f"Groq analyzer client initialization failed: {e}")
-    client_analyzer = None
-    MODEL_ANALYZER_OK = False
+# Document analysis shares the async Groq client (see services/llm_client.py)
+MODEL_ANALYZER_OK = llm_client.MODEL_OK
+
+# Long documents take longer to analyze than chat turns
+ANALYZER_TIMEOUT_SECONDS = float(os.getenv("ANALYZER_TIMEOUT_SECONDS", "120"))
+
+# Long documents are analyzed in token-bounded chunks: input tokens per chunk,
+# output tokens per chunk analysis and chunks analyzed at once per document
+ANALYZER_CHUNK_TOKENS = int(os.getenv("ANALYZER_CHUNK_TOKENS", "4000"))
+ANALYZER_CHUNK_OUTPUT_TOKENS = int(os.getenv("ANALYZER_CHUNK_OUTPUT_TOKENS", "1500"))
+ANALYZER_CHUNK_CONCURRENCY = int(os.getenv("ANALYZER_CHUNK_CONCURRENCY", "4"))
+
+ANALYSIS_KEYS = ["summary", "importantValues", "keywords", "highlightedPoints"]
+
+# Static analysis instructions. Sent as the first (system) message and kept
+# byte-identical across requests so the provider can reuse the cached prefix.
+ANALYSIS_SYSTEM_PROMPT = """You are a highly accurate medical document analysis AI. Your task is to read the medical document provided by the user and extract specific information. Provide the output in a structured JSON format.
+
+Analyze the document and provide the following:
+1.  **A concise summary** of the report (e.g., type of report, main findings).
+2.  **Important medical values** mentioned, especially related to specific conditions (like vitamin deficiencies, blood work, etc.). List them as a list of objects with 'label', 'value', and 'unit' (if available).
+3.  **Key medical keywords** or terms from the document.
+4.  **Important points or conclusions** highlighted as a list of bullet points.
+
+**VERY IMPORTANT:** Your response MUST contain ONLY the JSON object with the EXACT keys: "summary", "importantValues", "keywords", and "highlightedPoints". Do not include any other text, markdown formatting (like ```json`), or explanations before or after the JSON. The output should start with '{' and end with '}'."""
+
+# Identifies the model, prompt and chunking behind a cached analysis; any change
+# to them yields new cache keys so stale results are never served
+ANALYSIS_VERSION = hashlib.sha256(
+    f"{GROQ_MODEL}|{ANALYZER_CHUNK_TOKENS}|{ANALYZER_CHUNK_OUTPUT_TOKENS}|{ANALYSIS_SYSTEM_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+def build_analysis_messages(document_text: str, part_label: str = None):
+    """Build the chat messages for analyzing document_text (optionally one labelled part of it)."""
+    heading = f"Document Text ({part_label}):" if part_label else "Document Text:"
+    return [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{heading}\n\n{document_text}\n\nJSON Output:"},
+    ]
 
 # Helper function to generate response
-def generate_response(client_instance, prompt):
-    """Generate a response using the Groq client."""
+async def generate_response(messages, max_tokens=7000):
+    """Generate a response using the shared async Groq client."""
     logger.info("Inside document_analyzer_service generate_response function.")
     try:
         logger.info("Attempting to call Groq chat completion.")
-        chat_completion = client_instance.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
+        response_text = await llm_client.chat_completion(
+            messages=messages,
             model=GROQ_MODEL,
-            max_tokens=7000,
+            max_tokens=max_tokens,
             temperature=0.3,
+            timeout=ANALYZER_TIMEOUT_SECONDS,
+            priority=llm_priority.BULK,
         )
         logger.info("Groq chat completion call finished.")
         
-        if chat_completion.choices and len(chat_completion.choices) > 0:
-            response_text = chat_completion.choices[0].message.content
+        if response_text is not None:
             logger.info("Successfully extracted response from Groq analyzer.")
             return response_text
         else:
@@ -74,10 +97,237 @@ def clean_response(response):
         response = response.replace("\n\n\n", "\n\n")
     return response
 
-async def analyze_document_with_watsonx(document_text: str):
+def parse_analysis_response(raw_response: str):
+    """
+    Extract the analysis JSON object from a raw model response.
+
+    Returns:
+        dict or None: The parsed analysis with the required keys, or None
+    """
+    if not raw_response:
+        return None
+
+    # Fast path: the model followed the instructions and returned bare JSON
+    try:
+        analysis_result = json.loads(clean_response(raw_response))
+    except json.JSONDecodeError:
+        analysis_result = None
+    if isinstance(analysis_result, dict):
+        if "medical_values" in analysis_result and "importantValues" not in analysis_result:
+            analysis_result["importantValues"] = analysis_result.pop("medical_values")
+        if all(key in analysis_result for key in ANALYSIS_KEYS):
+            return analysis_result
+
+    analysis_result = None
+
+    # Attempt to find and parse the first occurrence of a JSON object
+    json_match = re.search(r'\{\s*"summary":.*?\}', raw_response, re.DOTALL)
+
+    if json_match:
+        json_string = json_match.group(0)
+        # Clean up potential markdown code block wrapping
+        json_string = json_string.replace('```json', '').replace('```', '').strip()
+
+        # Attempt to fix common truncation issues - heuristics
+        # Try to close potentially open lists or objects at the end
+        if not json_string.endswith('}'):
+             logger.warning("JSON string does not end with }. Attempting to auto-close.")
+             # Simple heuristic: if it ends with part of a list/object, try to close it
+             if json_string.endswith('[') or json_string.endswith(',') or json_string.endswith('\n'):
+                  json_string += ']}' # Assume it was cutting off a list in an object
+             elif json_string.endswith('{'):
+                  json_string += '}' # Assume it was cutting off an object
+             logger.warning(f"Attempted to auto-close. New JSON string end: {json_string[-20:]}")
+
+        # Final clean up of trailing commas/syntax issues before load
+        json_string = re.sub(r',\s*\}', '}', json_string)
+        json_string = re.sub(r',\s*\]', ']', json_string)
+        json_string = json_string.rstrip(',')
+
+        try:
+            analysis_result = json.loads(json_string)
+            logger.info("Successfully parsed the (potentially cleaned) JSON analysis result.")
+            
+            # --- Add logic to handle potential key mismatch ---
+            if analysis_result and "medical_values" in analysis_result and "importantValues" not in analysis_result:
+                analysis_result["importantValues"] = analysis_result.pop("medical_values")
+                logger.warning("Renamed 'medical_values' key to 'importantValues'.")
+            # ------------------------------------------------
+
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse the (potentially cleaned) JSON from analyzer: {e}")
+            analysis_result = None # Ensure analysis_result is None on failure
+
+    if isinstance(analysis_result, dict) and all(key in analysis_result for key in ANALYSIS_KEYS):
+        return analysis_result
+    return None
+
+class ChunkSplitter:
+    """
+    Split document text into chunks of at most max_tokens tokens as it arrives.
+
+    Chunks break on line boundaries; a single line longer than the limit is
+    split on word boundaries. Text can be fed in any pieces (e.g. one page at
+    a time): a line left open at the end of a piece is continued by the next,
+    so the chunks do not depend on how the text was divided.
+    """
+
+    def __init__(self, max_tokens: int = ANALYZER_CHUNK_TOKENS):
+        self.max_tokens = max_tokens
+        self._open_line = ""
+        self._current = []
+        self._current_tokens = 0
+        self._ready = []
+
+    def feed(self, text: str):
+        """Add text; returns the chunks completed by it."""
+        lines = (self._open_line + text).split("\n")
+        self._open_line = lines.pop()
+        for line in lines:
+            self._add_line(line)
+        return self._take()
+
+    def close(self):
+        """End the text; returns the remaining chunks."""
+        self._add_line(self._open_line)
+        self._open_line = ""
+        self._flush()
+        return self._take()
+
+    def _take(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _flush(self):
+        if self._current:
+            text = "\n".join(self._current).strip()
+            if text:
+                self._ready.append(text)
+        self._current = []
+        self._current_tokens = 0
+
+    def _add_line(self, line: str):
+        max_tokens = self.max_tokens
+        line_tokens = count_tokens(line) + 1
+        if line_tokens > max_tokens:
+            self._flush()
+            words = []
+            words_tokens = 0
+            for word in line.split():
+                word_tokens = count_tokens(word) + 1
+                if words and words_tokens + word_tokens > max_tokens:
+                    self._ready.append(" ".join(words))
+                    words = []
+                    words_tokens = 0
+                words.append(word)
+                words_tokens += word_tokens
+            if words:
+                self._current = [" ".join(words)]
+                self._current_tokens = words_tokens
+            return
+        if self._current_tokens + line_tokens > max_tokens:
+            self._flush()
+        self._current.append(line)
+        self._current_tokens += line_tokens
+
+def split_into_chunks(document_text: str, max_tokens: int = ANALYZER_CHUNK_TOKENS):
+    """
+    Split document text into chunks of at most max_tokens tokens (see ChunkSplitter).
+
+    Args:
+        document_text (str): The extracted document text
+        max_tokens (int): Token limit per chunk
+
+    Returns:
+        list: Chunk strings in document order
+    """
+    splitter = ChunkSplitter(max_tokens)
+    return splitter.feed(document_text) + splitter.close()
+
+async def chunk_pages(pages, max_tokens: int = ANALYZER_CHUNK_TOKENS):
+    """
+    Split pages into chunks while they are being extracted.
+
+    Each page is released once it has been split, so the whole document text
+    is never held at once. The chunks equal split_into_chunks of the joined pages.
+
+    Args:
+        pages: Async iterable of page texts in document order (e.g. iter_pages)
+        max_tokens (int): Token limit per chunk
+
+    Yields:
+        str: Chunk strings in document order
+    """
+    splitter = ChunkSplitter(max_tokens)
+    async for page in pages:
+        for chunk in splitter.feed(page):
+            yield chunk
+    for chunk in splitter.close():
+        yield chunk
+
+def _dedup_key(value):
+    """Normalize a merged item so trivially different duplicates compare equal."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k).lower(), _dedup_key(v)) for k, v in value.items()))
+    return re.sub(r"[^\w%./]+", " ", str(value).lower()).strip()
+
+def _merge_unique(lists):
+    merged = []
+    seen = set()
+    for items in lists:
+        for item in items or []:
+            key = _dedup_key(item)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged
+
+def merge_analyses(analyses):
+    """
+    Merge per-chunk analyses into one result with the same schema.
+
+    Summaries are joined in document order; values, keywords and points are
+    deduplicated, keeping the first occurrence.
+    """
+    summaries = _merge_unique([[a.get("summary")] for a in analyses if a.get("summary")])
+    return {
+        "summary": "\n\n".join(str(summary) for summary in summaries),
+        "importantValues": _merge_unique(a.get("importantValues") for a in analyses),
+        "keywords": _merge_unique(a.get("keywords") for a in analyses),
+        "highlightedPoints": _merge_unique(a.get("highlightedPoints") for a in analyses),
+    }
+
+async def analyze_chunk(chunk: str, index: int, total: int, semaphore: asyncio.Semaphore):
+    """Analyze one chunk; returns (parsed analysis or None, raw response)."""
+    label = f"part {index + 1} of {total}" if total > 1 else None
+    messages = build_analysis_messages(chunk, label)
+    async with semaphore:
+        raw_response = await generate_response(messages, max_tokens=ANALYZER_CHUNK_OUTPUT_TOKENS if total > 1 else 7000)
+    logger.info(f"Received analyzer response for chunk {index + 1}/{total}: {raw_response[:200]}...")
+    logger.debug("Full Raw Analyzer Response: %s", raw_response) # Full raw response for debugging
+    return parse_analysis_response(raw_response), raw_response
+
+async def analyze_document_with_status(document_text: str):
     """
     Analyzes medical document text using the Groq AI model for analysis.
     Instructs the model to extract summary, key values, keywords, and highlighted points.
+
+    Returns:
+        tuple: (analysis dict, True if it came from the model rather than a fallback)
+
+    Long documents are split into token-bounded chunks that are analyzed
+    concurrently and merged, so latency follows the slowest chunk rather
+    than the document length.
+    """
+    return await analyze_chunks_with_status(split_into_chunks(document_text))
+
+async def analyze_chunks_with_status(chunks):
+    """
+    Analyze a document already split into chunks (see chunk_pages).
+
+    Returns:
+        tuple: (analysis dict, True if it came from the model rather than a fallback)
     """
     if not MODEL_ANALYZER_OK:
         logger.error("Groq analyzer client is not initialized for document analysis.")
@@ -86,81 +336,27 @@ async def analyze_document_with_watsonx(document_text: str):
             "importantValues": [],
             "keywords": [],
             "highlightedPoints": []
-        }
+        }, False
 
-    prompt = f"""
-You are a highly accurate medical document analysis AI. Your task is to read the following medical document and extract specific information. Provide the output in a structured JSON format.
+    chunks = list(chunks) or [""]
 
-Document Text:
-
-{document_text}
-
-
-Analyze the document and provide the following:
-1.  **A concise summary** of the report (e.g., type of report, main findings).
-2.  **Important medical values** mentioned, especially related to specific conditions (like vitamin deficiencies, blood work, etc.). List them as a list of objects with 'label', 'value', and 'unit' (if available).
-3.  **Key medical keywords** or terms from the document.
-4.  **Important points or conclusions** highlighted as a list of bullet points.
-
-**VERY IMPORTANT:** Your response MUST contain ONLY the JSON object with the EXACT keys: "summary", "importantValues", "keywords", and "highlightedPoints". Do not include any other text, markdown formatting (like ```json`), or explanations before or after the JSON. The output should start with '{' and end with '}'.
-
-JSON Output:"""
-
-    logger.info(f"Sending document analysis prompt to Groq analyzer. Text length: {len(document_text)}")
-    logger.debug(f"Analysis Prompt: {prompt[:500]}...") # Log start of prompt
+    logger.info(f"Sending document analysis prompt to Groq analyzer. Text length: {sum(len(chunk) for chunk in chunks)}, chunks: {len(chunks)}")
 
     try:
-        # Use the dedicated analyzer client
-        raw_response = generate_response(client_analyzer, prompt)
-        logger.info("Received raw response from Groq analyzer.")
-        logger.info(f"Raw Analyzer Response: {raw_response[:500]}...") # Detailed logging
-        logger.debug("Full Raw Analyzer Response: %s", raw_response) # Full raw response for debugging
-
-        analysis_result = None
+        semaphore = asyncio.Semaphore(ANALYZER_CHUNK_CONCURRENCY)
+        results = await asyncio.gather(*(
+            analyze_chunk(chunk, i, len(chunks), semaphore) for i, chunk in enumerate(chunks)
+        ))
+        analyses = [analysis for analysis, _ in results if analysis]
 
-        # Attempt to find and parse the first occurrence of a JSON object
-        json_match = re.search(r'\{\s*"summary":.*?\}', raw_response, re.DOTALL)
-
-        if json_match:
-            json_string = json_match.group(0)
-            # Clean up potential markdown code block wrapping
-            json_string = json_string.replace('```json', '').replace('```', '').strip()
-
-            # Attempt to fix common truncation issues - heuristics
-            # Try to close potentially open lists or objects at the end
-            if not json_string.endswith('}'):
-                 logger.warning("JSON string does not end with }. Attempting to auto-close.")
-                 # Simple heuristic: if it ends with part of a list/object, try to close it
-                 if json_string.endswith('[') or json_string.endswith(',') or json_string.endswith('\n'):
-                      json_string += ']}' # Assume it was cutting off a list in an object
-                 elif json_string.endswith('{'):
-                      json_string += '}' # Assume it was cutting off an object
-                 logger.warning(f"Attempted to auto-close. New JSON string end: {json_string[-20:]}")
-
-            # Final clean up of trailing commas/syntax issues before load
-            json_string = re.sub(r',\s*\}', '}', json_string)
-            json_string = re.sub(r',\s*\]', ']', json_string)
-            json_string = json_string.rstrip(',')
-
-            try:
-                analysis_result = json.loads(json_string)
-                logger.info("Successfully parsed the (potentially cleaned) JSON analysis result.")
-                
-                # --- Add logic to handle potential key mismatch ---
-                if analysis_result and "medical_values" in analysis_result and "importantValues" not in analysis_result:
-                    analysis_result["importantValues"] = analysis_result.pop("medical_values")
-                    logger.warning("Renamed 'medical_values' key to 'importantValues'.")
-                # ------------------------------------------------
-
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse the (potentially cleaned) JSON from analyzer: {e}")
-                analysis_result = None # Ensure analysis_result is None on failure
-
-        # Final check on the structure before returning
-        if analysis_result and all(key in analysis_result for key in ["summary", "importantValues", "keywords", "highlightedPoints"]):
+        if analyses:
+            if len(analyses) < len(chunks):
+                logger.warning(f"{len(chunks) - len(analyses)} of {len(chunks)} document chunks could not be analyzed.")
             logger.info("Final analysis result from analyzer has required keys. Returning parsed result.")
-            return analysis_result
+            # Partial results are returned but not reported as complete
+            return (analyses[0] if len(chunks) == 1 else merge_analyses(analyses)), len(analyses) == len(chunks)
         else:
+            raw_response = results[0][1] if results else ""
             logger.error("Final analysis result from analyzer is missing required keys or no valid/expected JSON was parsed.")
             # Fallback: Return a more informative message if parsing fails
             fallback_summary = "Analysis failed: Could not extract structured response from AI model.\n"
@@ -171,7 +367,7 @@ JSON Output:"""
                 "importantValues": [],
                 "keywords": [],
                 "highlightedPoints": ["Please check backend logs for the full raw AI response and parsing errors in document_analyzer_service.py."]
-            }
+            }, False
 
     except Exception as e:
         logger.error(f"Error during document analysis with Groq analyzer: {str(e)}", exc_info=True)
@@ -180,4 +376,114 @@ JSON Output:"""
             "importantValues": [],
             "keywords": [],
             "highlightedPoints": ["Analysis could not be completed."]
-        } 
\ No newline at end of file
+        }, False
+
+async def analyze_document_with_watsonx(document_text: str):
+    """
+    Analyzes medical document text using the Groq AI model for analysis.
+    Returns the analysis dict, or a fallback dict with the same keys on failure.
+    """
+    analysis_result, _ = await analyze_document_with_status(document_text)
+    return analysis_result
+
+async def _stream_chunk(chunk: str, index: int, total: int, semaphore: asyncio.Semaphore, events: asyncio.Queue):
+    """Stream the analysis of one chunk, putting parser events on the queue as they complete."""
+    label = f"part {index + 1} of {total}" if total > 1 else None
+    messages = build_analysis_messages(chunk, label)
+    parser = IncrementalJSONParser()
+    analysis = None
+    try:
+        async with semaphore:
+            async for token in llm_client.stream_chat_completion(
+                messages=messages,
+                model=GROQ_MODEL,
+                max_tokens=ANALYZER_CHUNK_OUTPUT_TOKENS if total > 1 else 7000,
+                temperature=0.3,
+                timeout=ANALYZER_TIMEOUT_SECONDS,
+                priority=llm_priority.BULK,
+            ):
+                for event in parser.feed(token):
+                    await events.put((index, event))
+        logger.debug("Full Raw Analyzer Response: %s", parser.buffer)
+        analysis = parse_analysis_response(parser.buffer)
+    except Exception as e:
+        logger.error(f"Error streaming analysis of chunk {index + 1}/{total}: {str(e)}", exc_info=True)
+    if analysis is None and parser.fields.get("summary"):
+        # Keep what arrived before the stream was cut off
+        analysis = {key: parser.fields.get(key, [] if key != "summary" else "") for key in ANALYSIS_KEYS}
+        await events.put((index, ("partial", None, None)))
+    await events.put((index, ("end", None, analysis)))
+
+async def stream_document_analysis(document_text: str):
+    """Analyze document text, yielding results as the model produces them (see stream_chunks_analysis)."""
+    async for event, data in stream_chunks_analysis(split_into_chunks(document_text)):
+        yield event, data
+
+async def stream_chunks_analysis(chunks):
+    """
+    Analyze a document already split into chunks (see chunk_pages), yielding
+    results as the model produces them.
+
+    Yields:
+        tuple: (event, data) pairs:
+            - ("meta", {"chunks": n})
+            - ("summary", {"text": ..., "part": i}) for each chunk summary
+            - ("item", {"key": ..., "value": ...}) for each new importantValues,
+              keywords or highlightedPoints entry (deduplicated across chunks)
+            - ("done", {"result": analysis dict, "complete": bool}) last
+    """
+    if not MODEL_ANALYZER_OK:
+        logger.error("Groq analyzer client is not initialized for document analysis.")
+        yield "done", {"result": {
+            "summary": "Analysis failed: AI model not available.",
+            "importantValues": [],
+            "keywords": [],
+            "highlightedPoints": []
+        }, "complete": False}
+        return
+
+    chunks = list(chunks) or [""]
+    logger.info(f"Streaming document analysis. Text length: {sum(len(chunk) for chunk in chunks)}, chunks: {len(chunks)}")
+    yield "meta", {"chunks": len(chunks)}
+
+    events = asyncio.Queue()
+    semaphore = asyncio.Semaphore(ANALYZER_CHUNK_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(_stream_chunk(chunk, i, len(chunks), semaphore, events))
+        for i, chunk in enumerate(chunks)
+    ]
+    analyses = [None] * len(chunks)
+    complete = True
+    seen = {key: set() for key in ANALYSIS_KEYS}
+    try:
+        remaining = len(chunks)
+        while remaining:
+            index, (kind, key, value) = await events.get()
+            if kind == "end":
+                analyses[index] = value
+                complete = complete and value is not None
+                remaining -= 1
+            elif kind == "partial":
+                complete = False
+            elif kind == "item" and key in seen:
+                dedup_key = _dedup_key(value)
+                if dedup_key and dedup_key not in seen[key]:
+                    seen[key].add(dedup_key)
+                    yield "item", {"key": key, "value": value}
+            elif kind == "field" and key == "summary":
+                yield "summary", {"text": value, "part": index}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    parsed = [analysis for analysis in analyses if analysis]
+    if not parsed:
+        yield "done", {"result": {
+            "summary": "Analysis failed: Could not extract structured response from AI model.",
+            "importantValues": [],
+            "keywords": [],
+            "highlightedPoints": ["Please check backend logs for the full raw AI response and parsing errors in document_analyzer_service.py."]
+        }, "complete": False}
+        return
+    result = parsed[0] if len(chunks) == 1 else merge_analyses(parsed)
+    yield "done", {"result": result, "complete": complete}
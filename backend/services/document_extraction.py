@@ -0,0 +1,379 @@
+"""
+Document upload spooling and text extraction in a process pool.
+
+Uploads are streamed to a temporary file (hashed on the way) instead of
+being read into memory. PyMuPDF and python-docx are CPU-bound, so extraction
+runs in worker processes that open the spooled file by path. PDFs are split
+into page ranges that are extracted in parallel and yielded in page order as
+each range finishes. Each document has a CPU time budget: workers check it
+between pages to fail cleanly, and the kernel (RLIMIT_CPU) kills a worker
+that overruns it inside a single page or parser call.
+"""
+
+import os
+import math
+import time
+import signal
+import zipfile
+import hashlib
+import tempfile
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import resource # Unix only; without it the budget is only checked between pages
+except ImportError:
+    resource = None
+
+# Import libraries for document parsing (install these: pip install PyMuPDF python-docx)
+try:
+    import fitz # PyMuPDF
+except ImportError:
+    fitz = None
+try:
+    import docx # python-docx
+except ImportError:
+    docx = None
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_EXTRACTION_WORKERS = int(os.getenv("DOCUMENT_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+DOCUMENT_PAGES_PER_TASK = int(os.getenv("DOCUMENT_PAGES_PER_TASK", "20"))
+DOCUMENT_EXTRACTION_CPU_SECONDS = float(os.getenv("DOCUMENT_EXTRACTION_CPU_SECONDS", "30"))
+DOCUMENT_MAX_UPLOAD_BYTES = int(os.getenv("DOCUMENT_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+DOCUMENT_SPOOL_DIR = os.getenv("DOCUMENT_SPOOL_DIR") or None
+DOCUMENT_BULK_MAX_FILES = int(os.getenv("DOCUMENT_BULK_MAX_FILES", "100"))
+UPLOAD_READ_BYTES = 1024 * 1024
+# CPU seconds past the budget before the kernel kills a worker, so the checks
+# between pages normally report an overrun first
+CPU_LIMIT_GRACE_SECONDS = 2
+SUPPORTED_EXTENSIONS = {"pdf", "doc", "docx", "txt"}
+
+
+class DocumentExtractionError(Exception):
+    """Raised when a document cannot be parsed; carries the HTTP status to report."""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _CPUBudgetExceeded(Exception):
+    pass
+
+
+class SpooledUpload:
+    """An upload written to a temporary file; delete it with close()."""
+
+    def __init__(self, path, filename, size, sha256):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def spool_upload(upload, max_bytes=DOCUMENT_MAX_UPLOAD_BYTES):
+    """
+    Stream an UploadFile to a temporary file in fixed-size blocks.
+
+    Args:
+        upload (UploadFile): The uploaded document
+        max_bytes (int): Largest accepted upload
+
+    Returns:
+        SpooledUpload: Path, size and SHA-256 of the stored upload
+
+    Raises:
+        DocumentExtractionError: With status 413 if the upload is too large
+    """
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=DOCUMENT_SPOOL_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                block = await upload.read(UPLOAD_READ_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise DocumentExtractionError(f"Document is larger than the {max_bytes} byte upload limit", status_code=413)
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledUpload(path, upload.filename, size, digest.hexdigest())
+
+
+def expand_zip(path, max_bytes=DOCUMENT_MAX_UPLOAD_BYTES, max_files=DOCUMENT_BULK_MAX_FILES):
+    """
+    Spool the supported documents inside a zip archive to temporary files.
+
+    Blocking; run it off the event loop. Members are decompressed in blocks
+    and each is cut off at max_bytes regardless of the size it declares.
+
+    Returns:
+        list: (filename, SpooledUpload or None, error message or None) tuples
+
+    Raises:
+        DocumentExtractionError: If the archive is invalid or holds more than max_files documents
+    """
+    entries = []
+    try:
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                filename = info.filename
+                basename = os.path.basename(filename)
+                if info.is_dir() or filename.startswith("__MACOSX/") or basename.startswith("."):
+                    continue
+                if basename.split('.')[-1].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                if len(entries) >= max_files:
+                    raise DocumentExtractionError(f"Archive holds more than {max_files} documents", status_code=413)
+                fd, member_path = tempfile.mkstemp(suffix=os.path.splitext(basename)[1], dir=DOCUMENT_SPOOL_DIR)
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    with os.fdopen(fd, "wb") as out, archive.open(info) as member:
+                        while True:
+                            block = member.read(UPLOAD_READ_BYTES)
+                            if not block:
+                                break
+                            size += len(block)
+                            if size > max_bytes:
+                                raise DocumentExtractionError(f"Document is larger than the {max_bytes} byte upload limit", status_code=413)
+                            digest.update(block)
+                            out.write(block)
+                except DocumentExtractionError as e:
+                    os.remove(member_path)
+                    entries.append((filename, None, str(e)))
+                    continue
+                except BaseException:
+                    os.remove(member_path)
+                    raise
+                entries.append((filename, SpooledUpload(member_path, basename, size, digest.hexdigest()), None))
+    except DocumentExtractionError:
+        for _, upload, _ in entries:
+            if upload:
+                upload.close()
+        raise
+    except (zipfile.BadZipFile, OSError) as e:
+        for _, upload, _ in entries:
+            if upload:
+                upload.close()
+        raise DocumentExtractionError(f"Error reading zip archive: {_describe(e, path, 'archive')}", status_code=400)
+    return entries
+
+
+def _init_worker():
+    """Worker initializer: exceeding RLIMIT_CPU terminates the process."""
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+
+
+class _cpu_limit:
+    """
+    Worker: cap this task's CPU time with RLIMIT_CPU. The kernel kills the
+    worker if it overruns, even inside C code such as a pathological page or
+    a zip/XML bomb in docx.Document, which never return to Python checks.
+    """
+
+    def __init__(self, cpu_seconds):
+        self.cpu_seconds = cpu_seconds
+
+    def __enter__(self):
+        if resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            # RLIMIT_CPU counts the process's total CPU time, so the limit is relative to what it has used
+            limit = math.ceil(usage.ru_utime + usage.ru_stime + self.cpu_seconds + CPU_LIMIT_GRACE_SECONDS)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+        return self
+
+    def __exit__(self, *exc):
+        if resource is not None:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _pdf_page_count(path, cpu_seconds):
+    with _cpu_limit(cpu_seconds), fitz.open(path, filetype="pdf") as pdf_document:
+        return pdf_document.page_count
+
+
+def _extract_pdf_range(path, start, end, cpu_seconds):
+    """Worker: extract pages [start, end) of a PDF within a CPU time budget."""
+    started = time.process_time()
+    pages = []
+    # MuPDF reads the file on demand, so the PDF is never loaded into memory whole
+    with _cpu_limit(cpu_seconds), fitz.open(path, filetype="pdf") as pdf_document:
+        for page_num in range(start, end):
+            if time.process_time() - started > cpu_seconds:
+                raise _CPUBudgetExceeded(f"pages {start + 1}-{end} exceeded {cpu_seconds:.1f}s of CPU time")
+            pages.append(pdf_document.load_page(page_num).get_text())
+    return pages
+
+
+def _extract_docx(path, cpu_seconds):
+    """Worker: extract the paragraphs of a DOCX file as one page."""
+    started = time.process_time()
+    with _cpu_limit(cpu_seconds):
+        doc_obj = docx.Document(path)
+        paragraphs = []
+        for i, paragraph in enumerate(doc_obj.paragraphs):
+            if i % 200 == 0 and time.process_time() - started > cpu_seconds:
+                raise _CPUBudgetExceeded(f"document exceeded {cpu_seconds:.1f}s of CPU time")
+            paragraphs.append(paragraph.text + "\n")
+    return ["".join(paragraphs)]
+
+
+def _read_txt(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [f.read()]
+
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DOCUMENT_EXTRACTION_WORKERS, initializer=_init_worker)
+    return _executor
+
+
+def _discard_executor(executor):
+    """Shut down a broken pool (reaping its management thread and processes) and start a fresh one next time."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run(fn, *args):
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    try:
+        return await loop.run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (CPU limit or a crash on a malformed file) and took the
+        # pool's other tasks with it
+        logger.error("Document extraction pool broke, recreating it.")
+        _discard_executor(executor)
+    # Retry once in a pool of its own: tasks that were only collateral succeed,
+    # and the task that killed the worker fails again without hurting others
+    isolated = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+    try:
+        return await loop.run_in_executor(isolated, fn, *args)
+    finally:
+        isolated.shutdown(wait=False, cancel_futures=True)
+
+
+def _describe(error, path, filename):
+    """Error text for the client, naming the uploaded file instead of its temporary path."""
+    return str(error).replace(path, filename)
+
+
+def _page_ranges(page_count, pages_per_task):
+    """Split pages into at most one range per worker, each at least pages_per_task long."""
+    if page_count <= 0:
+        return []
+    tasks = max(1, min(DOCUMENT_EXTRACTION_WORKERS, -(-page_count // max(pages_per_task, 1))))
+    size = -(-page_count // tasks)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+async def iter_pages(path, filename, cpu_seconds=DOCUMENT_EXTRACTION_CPU_SECONDS):
+    """
+    Extract a spooled document, yielding the text of each page (PDF) or of the
+    whole document (DOCX, TXT) in order as soon as it is available.
+
+    Args:
+        path (str): Path of the spooled upload
+        filename (str): Original file name, used to pick the parser
+        cpu_seconds (float): CPU time budget for the whole document
+
+    Yields:
+        str: Page texts in document order
+
+    Raises:
+        DocumentExtractionError: If the type is unsupported, a parser is
+            missing, parsing fails or the CPU budget is exceeded
+    """
+    file_extension = filename.split('.')[-1].lower()
+
+    if file_extension == 'pdf':
+        if not fitz:
+            raise DocumentExtractionError("PyMuPDF not installed. Cannot process PDF files.")
+        futures = []
+        try:
+            page_count = await _run(_pdf_page_count, path, cpu_seconds)
+            # Each range gets the share of the budget matching its share of the pages
+            futures = [
+                asyncio.ensure_future(_run(_extract_pdf_range, path, start, end, cpu_seconds * (end - start) / page_count))
+                for start, end in _page_ranges(page_count, DOCUMENT_PAGES_PER_TASK)
+            ]
+            for future in futures:
+                pages = await future
+                pages.reverse()
+                while pages:
+                    # Hand pages over one at a time so consumers can release them
+                    yield pages.pop()
+        except _CPUBudgetExceeded as e:
+            raise DocumentExtractionError(f"PDF is too expensive to parse: {_describe(e, path, filename)}", status_code=422)
+        except BrokenProcessPool:
+            raise DocumentExtractionError("PDF is too expensive to parse: the worker was stopped at its CPU limit or crashed", status_code=422)
+        except (DocumentExtractionError, GeneratorExit, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise DocumentExtractionError(f"Error parsing PDF: {_describe(e, path, filename)}")
+        finally:
+            for future in futures:
+                future.cancel()
+        return
+
+    if file_extension in ['doc', 'docx']:
+        if not docx:
+            raise DocumentExtractionError("python-docx not installed. Cannot process DOC/DOCX files.")
+        try:
+            pages = await _run(_extract_docx, path, cpu_seconds)
+        except _CPUBudgetExceeded as e:
+            raise DocumentExtractionError(f"DOC/DOCX is too expensive to parse: {_describe(e, path, filename)}", status_code=422)
+        except BrokenProcessPool:
+            raise DocumentExtractionError("DOC/DOCX is too expensive to parse: the worker was stopped at its CPU limit or crashed", status_code=422)
+        except Exception as e:
+            raise DocumentExtractionError(f"Error parsing DOC/DOCX: {_describe(e, path, filename)}")
+    elif file_extension == 'txt':
+        try:
+            pages = await _run(_read_txt, path)
+        except Exception as e:
+            raise DocumentExtractionError(f"Error decoding TXT: {_describe(e, path, filename)}")
+    else:
+        raise DocumentExtractionError(f"Unsupported file type: {file_extension}", status_code=400)
+
+    for page in pages:
+        yield page
+
+
+def shutdown():
+    """Stop the worker processes."""
+    if _executor is not None:
+        _discard_executor(_executor)
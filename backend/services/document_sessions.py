@@ -0,0 +1,239 @@
+"""
+Persistent document sessions for follow-up questions about an uploaded document.
+
+A document is parsed once on upload. The session keeps its page-level chunks,
+a small term index over them and the question/answer history on disk, so each
+follow-up question sends only the chunks relevant to it. Sessions hold the
+document text, so they are deleted once unused for DOCUMENT_SESSION_TTL_SECONDS.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import asyncio
+import logging
+import weakref
+from collections import Counter
+from datetime import datetime
+from services.document_analyzer_service import split_into_chunks
+from services.atomic_files import write_atomic
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DOCUMENT_SESSION_DIR = os.getenv("DOCUMENT_SESSION_DIR", os.path.join(BACKEND_DIR, "data", "document_sessions"))
+DOCUMENT_SESSION_CHUNK_TOKENS = int(os.getenv("DOCUMENT_SESSION_CHUNK_TOKENS", "400"))
+DOCUMENT_SESSION_TOP_K = int(os.getenv("DOCUMENT_SESSION_TOP_K", "4"))
+DOCUMENT_SESSION_MAX_HISTORY = int(os.getenv("DOCUMENT_SESSION_MAX_HISTORY", "20"))
+# Sessions not used (created or asked about) for this long are deleted
+DOCUMENT_SESSION_TTL_SECONDS = float(os.getenv("DOCUMENT_SESSION_TTL_SECONDS", str(24 * 3600)))
+
+_DOCUMENT_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+_TERM_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "the", "this", "to", "was", "what", "which", "with",
+}
+
+
+def tokenize(text):
+    """Lowercase terms used by the session index (numbers with decimals are kept whole)."""
+    return [t for t in _TERM_PATTERN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def build_chunks(pages, max_tokens=DOCUMENT_SESSION_CHUNK_TOKENS):
+    """
+    Split page texts into token-bounded chunks that remember their page.
+
+    Args:
+        pages (list): Page texts in document order
+        max_tokens (int): Token limit per chunk
+
+    Returns:
+        list: Dicts with 'page' (1-based) and 'text'
+    """
+    chunks = []
+    for page_number, page_text in enumerate(pages, start=1):
+        chunks.extend(_page_chunks(page_number, page_text, max_tokens))
+    return chunks
+
+
+async def build_chunks_from_pages(pages, max_tokens=DOCUMENT_SESSION_CHUNK_TOKENS):
+    """
+    Like build_chunks, for pages that are still being extracted; each page is
+    released once it has been split.
+
+    Args:
+        pages: Async iterable of page texts in document order (e.g. iter_pages)
+        max_tokens (int): Token limit per chunk
+
+    Returns:
+        tuple: (chunk dicts, page count)
+    """
+    chunks = []
+    page_count = 0
+    async for page_text in pages:
+        page_count += 1
+        chunks.extend(_page_chunks(page_count, page_text, max_tokens))
+    return chunks, page_count
+
+
+def _page_chunks(page_number, page_text, max_tokens):
+    return [{"page": page_number, "text": text} for text in split_into_chunks(page_text, max_tokens)]
+
+
+def build_index(chunks):
+    """Term counts per chunk plus document frequencies for TF-IDF scoring."""
+    chunk_terms = [dict(Counter(tokenize(chunk["text"]))) for chunk in chunks]
+    document_frequency = Counter()
+    for terms in chunk_terms:
+        document_frequency.update(terms.keys())
+    return {"chunk_terms": chunk_terms, "df": dict(document_frequency)}
+
+
+def search_chunks(session, query, k=DOCUMENT_SESSION_TOP_K):
+    """
+    Find the chunks of a session most relevant to a query.
+
+    Returns:
+        list: Up to k chunk dicts in document order; the opening chunks when
+              no query term occurs in the document
+    """
+    chunks = session["chunks"]
+    index = session["index"]
+    total = len(chunks)
+    query_terms = set(tokenize(query))
+    scores = []
+    for i, terms in enumerate(index["chunk_terms"]):
+        score = 0.0
+        for term in query_terms:
+            tf = terms.get(term)
+            if tf:
+                score += (1 + math.log(tf)) * math.log(1 + total / index["df"][term])
+        if score > 0:
+            scores.append((score, i))
+    if not scores:
+        return chunks[:k]
+    best = sorted(i for _, i in sorted(scores, reverse=True)[:k])
+    return [chunks[i] for i in best]
+
+
+class DocumentSessionStore:
+    """Stores one JSON file per document session; file mtimes record the last use."""
+
+    def __init__(self, directory=DOCUMENT_SESSION_DIR, ttl_seconds=DOCUMENT_SESSION_TTL_SECONDS):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._locks = weakref.WeakValueDictionary()
+
+    def lock(self, document_id):
+        """
+        The lock serializing updates of one session in this process. Hold it
+        from get() to append_exchange() so concurrent questions do not
+        overwrite each other's exchanges.
+        """
+        lock = self._locks.get(document_id)
+        if lock is None:
+            lock = self._locks[document_id] = asyncio.Lock()
+        return lock
+
+    def _expired(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) > self.ttl_seconds
+        except OSError:
+            return False
+
+    def cleanup(self):
+        """Delete expired sessions; returns how many were deleted."""
+        removed = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json") and self._expired(entry.path):
+                        try:
+                            os.remove(entry.path)
+                            removed += 1
+                        except OSError:
+                            pass
+        except FileNotFoundError:
+            return 0
+        if removed:
+            logger.info(f"Deleted {removed} expired document sessions")
+        return removed
+
+    def _path(self, document_id):
+        if not _DOCUMENT_ID_PATTERN.fullmatch(document_id or ""):
+            return None
+        return os.path.join(self.directory, f"{document_id}.json")
+
+    def _write(self, session):
+        write_atomic(self._path(session["document_id"]), lambda f: json.dump(session, f))
+
+    def create(self, filename, chunks, page_count, analysis_context=""):
+        """
+        Create a session from the chunks of an uploaded document.
+
+        Args:
+            filename (str): Original file name
+            chunks (list): Chunk dicts from build_chunks or build_chunks_from_pages
+            page_count (int): Number of extracted pages
+            analysis_context (str): Earlier analysis of the document, if any
+
+        Returns:
+            dict: The stored session
+        """
+        session = {
+            "document_id": uuid.uuid4().hex,
+            "filename": filename,
+            "created_at": datetime.utcnow().isoformat(),
+            "page_count": page_count,
+            "analysis_context": analysis_context,
+            "chunks": chunks,
+            "index": build_index(chunks),
+            "history": [],
+        }
+        self._write(session)
+        self.cleanup()
+        logger.info(f"Created document session {session['document_id']} for {filename}: {page_count} pages, {len(chunks)} chunks")
+        return session
+
+    def get(self, document_id):
+        """Load a session, or None if it does not exist or has expired."""
+        path = self._path(document_id)
+        if path is None or not os.path.exists(path):
+            return None
+        if self._expired(path):
+            self.delete(document_id)
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Error loading document session {document_id}: {e}")
+            return None
+
+    def append_exchange(self, session, question, answer):
+        """Add a question and its answer to the session history and save it."""
+        now = datetime.utcnow().isoformat()
+        session["history"].append({"sender": "user", "text": question, "timestamp": now})
+        session["history"].append({"sender": "bot", "text": answer, "timestamp": now})
+        session["history"] = session["history"][-DOCUMENT_SESSION_MAX_HISTORY:]
+        self._write(session)
+
+    def delete(self, document_id):
+        """Delete a session; returns True if it existed."""
+        path = self._path(document_id)
+        if path is None:
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+# Shared store used by services/routes/analyzer.py
+document_sessions = DocumentSessionStore()
@@ -0,0 +1,92 @@
+"""
+Local text embeddings for knowledge-base vector search.
+
+Runs on the CPU with nothing to download: every word contributes its
+character n-grams (with word-boundary markers), each hashed into a fixed
+number of dimensions with a random sign, and the vector is L2-normalized.
+Words that share stems, prefixes or misspellings ("craving", "cravings",
+"cravng") land close together, which plain word overlap misses.
+"""
+
+import os
+import math
+import zlib
+import logging
+from array import array
+from functools import lru_cache
+from services.search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_NGRAM_MIN = 3
+EMBEDDING_NGRAM_MAX = 5
+
+# Stored vectors are only reusable by the same embedding scheme
+EMBEDDING_VERSION = f"hashed-ngrams-v1:{EMBEDDING_DIM}:{EMBEDDING_NGRAM_MIN}-{EMBEDDING_NGRAM_MAX}"
+
+
+@lru_cache(maxsize=65536)
+def _word_features(word, dim=EMBEDDING_DIM):
+    """(dimension, sign) of the whole word and of each character n-gram of it."""
+    marked = f"<{word}>"
+    grams = [marked]
+    for n in range(EMBEDDING_NGRAM_MIN, EMBEDDING_NGRAM_MAX + 1):
+        grams.extend(marked[i:i + n] for i in range(len(marked) - n + 1))
+    features = []
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        features.append((h % dim, 1.0 if h & 0x80000000 else -1.0))
+    return tuple(features)
+
+
+def embed_sparse(text, dim=EMBEDDING_DIM):
+    """
+    Embed a text as a sparse vector.
+
+    Returns:
+        dict: dimension -> weight, L2-normalized (empty for text without words)
+    """
+    counts = {}
+    for word in tokenize(text or ""):
+        counts[word] = counts.get(word, 0) + 1
+    vector = {}
+    for word, count in counts.items():
+        # Sublinear term frequency so repeated words do not dominate
+        weight = 1.0 + math.log(count)
+        for index, sign in _word_features(word, dim):
+            vector[index] = vector.get(index, 0.0) + sign * weight
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {index: value / norm for index, value in vector.items() if value}
+
+
+def embed_text(text, dim=EMBEDDING_DIM):
+    """Embed a text as a dense float32 vector (all zeros for text without words)."""
+    vector = array("f", bytes(4 * dim))
+    for index, value in embed_sparse(text, dim).items():
+        vector[index] = value
+    return vector
+
+
+def embed_texts(texts, dim=EMBEDDING_DIM, batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Embed texts in batches into one contiguous float32 buffer.
+
+    Args:
+        texts (list): Texts to embed
+        dim (int): Embedding dimensions
+        batch_size (int): Texts embedded per batch (progress is logged per batch)
+
+    Returns:
+        array: len(texts) * dim floats, row i holding the embedding of texts[i]
+    """
+    matrix = array("f")
+    for start in range(0, len(texts), batch_size):
+        for text in texts[start:start + batch_size]:
+            matrix.extend(embed_text(text, dim))
+        if len(texts) > batch_size:
+            logger.info(f"Embedded {min(start + batch_size, len(texts))}/{len(texts)} passages")
+    return matrix
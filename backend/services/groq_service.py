@@ -14,8 +14,8 @@ Helper Functions:
 - search_knowledge_base: Keyword-based search in nicotine knowledge base
 - detect_craving: Detect craving-related keywords in user messages
 - get_chat_history / save_chat_message: Chat history management
-- prepare_prompt: Comprehensive prompt preparation with user context
-- generate_response: Core function to interact with Groq API
+- prepare_prompt: Comprehensive chat message preparation with user context
+- generate_response: Core function to interact with Groq API (via the shared async llm_client)
 - clean_response: Response cleaning and formatting
 - get_relevant_knowledge: Retrieve relevant knowledge base entries
 - update_knowledge_base: Add new entries to the knowledge base
@@ -25,7 +25,7 @@ Data:
 - MOTIVATIONAL_TIPS: Encouraging messages for users
 - EMPATHETIC_OPENERS: Supportive conversation starters
 - COPING_STRATEGIES: Practical techniques for managing cravings
-- CRISIS_KEYWORDS / CRISIS_RESPONSE: Emergency support detection
+- CRISIS_RESPONSE: Emergency support message (crisis keywords are detected in services/signals.py)
 """
 
 import os
@@ -33,10 +33,15 @@ import logging
 import json
 import random
 from dotenv import load_dotenv
-from groq import Groq
+from services import llm_client, llm_priority
 from services.rag import retrieve_relevant_passages
+from services.signals import detect_signals, CRAVING_EXTENDED_KEYWORDS
 from services.craving import log_craving, get_craving_stats
 from services import chat as chat_service
+from services.prompt_budget import (
+    PromptSection, assemble_messages, PROMPT_BUDGETS,
+    PRIORITY_MESSAGE, PRIORITY_CONTEXT, PRIORITY_HISTORY, PRIORITY_PASSAGES
+)
 from datetime import datetime
 
 load_dotenv()
@@ -49,6 +54,13 @@ logger = logging.getLogger(__name__)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
 
+# Latency deadlines (seconds) for modes that must answer quickly; a hedged
+# request goes to GROQ_FAST_MODEL if the primary model is slow to start
+RESPONSE_DEADLINES = {
+    "voice": float(os.getenv("VOICE_DEADLINE_SECONDS", "4")),
+    "emergency": float(os.getenv("EMERGENCY_DEADLINE_SECONDS", "5")),
+}
+
 # Path for chat history
 USER_DATA_DIR = os.getenv("USER_DATA_DIR", "data/users")
 
@@ -137,24 +149,44 @@ COPING_STRATEGIES = [
     "Call or text a friend for support right now."
 ]
 
-CRISIS_KEYWORDS = ["hopeless", "suicidal", "give up", "end it", "can't go on", "kill myself", "emergency"]
 CRISIS_RESPONSE = "It sounds like you're going through a really tough time. If you're in crisis or need immediate help, please call the National Suicide Prevention Lifeline at 1-800-273-8255 or your local emergency number. You are not alone."
 MEDICAL_DISCLAIMER = "(Disclaimer: I am not a substitute for professional medical advice. For medical decisions, please consult a healthcare provider.)"
 
-# Initialize the Groq client
-try:
-    if GROQ_API_KEY:
-        client = Groq(api_key=GROQ_API_KEY)
-        MODEL_OK = True
-        logger.info(f"Successfully initialized Groq client with model: {GROQ_MODEL}")
-    else:
-        logger.error("GROQ_API_KEY not found in environment variables")
-        client = None
-        MODEL_OK = False
-except Exception as e:
-    logger.error(f"Groq client initialization failed: {e}")
-    client = None
-    MODEL_OK = False
+# Static system prompts. These are sent first and must stay byte-identical
+# across requests so the provider can reuse the cached prefix; per-user data
+# always goes in the following user message.
+CHAT_SYSTEM_PROMPT = """You are a supportive AI assistant for nicotine recovery. Your goal is to help users quit smoking and stay smoke-free.
+
+Please provide a helpful, supportive, and informative response. Your response should:
+1. Be empathetic and understanding
+2. Provide evidence-based information when relevant
+3. Offer practical coping strategies
+4. Be encouraging and motivational
+5. Avoid judgment or criticism
+6. Be concise and clear
+7. Focus on the user's specific situation and needs"""
+
+VOICE_SYSTEM_PROMPT = """You are a highly interactive, supportive, and empathetic nicotine recovery coach. Your primary goal is to engage the user in a helpful conversation to overcome cravings and stay smoke-free. Make the conversation feel natural and encouraging.
+
+Based on the user's message, their context, and the recent chat history, generate ONLY the assistant's direct response. Do NOT include any introductory phrases, meta-commentary, or instructions to yourself. Keep the response concise, natural, and focused on the user. Respond in a warm, supportive, and conversational tone.
+
+- Be empathetic and validate their feelings.
+- Directly address their current situation, especially if they mention a craving or challenge.
+- If appropriate, briefly offer a relevant piece of information from the knowledge base in a natural, conversational way.
+- If necessary, suggest ONE concrete, actionable coping strategy they can try right now.
+- Ask ONE open-ended, relevant follow-up question to encourage further interaction and show you are listening.
+- Keep your response very short and concise, ideally 1-3 sentences maximum unless the user asks for more information. Ensure the response flows well for spoken language.
+- Avoid repeating the user's message or explicitly stating that you are using the history or context.
+- Do not include any markdown or special formatting.
+- Do not use emojis.
+- Do not end the conversation mid-sentence."""
+
+DOCUMENT_CHAT_SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions about the provided medical document. Use only the information from the document and the provided analysis context to answer.
+
+Based on the document text, the provided analysis context, and chat history, answer the user's question. If the answer is not in the document or the analysis context, state that you cannot find the information."""
+
+# The async Groq client is shared across services (see services/llm_client.py)
+MODEL_OK = llm_client.MODEL_OK
 
 
 def search_knowledge_base(query, knowledge_base):
@@ -194,15 +226,19 @@ def search_knowledge_base(query, knowledge_base):
 
 
 def craving_keywords():
-    return [
-        "craving", "urge", "desire", "want to smoke", "need a cigarette", "temptation", "nicotine hit",
-        "can't resist", "really want to smoke", "smoke so bad", "need to vape", "need to smoke"
-    ]
+    return CRAVING_EXTENDED_KEYWORDS
 
 
 def detect_craving(message):
-    msg = message.lower()
-    return any(kw in msg for kw in craving_keywords())
+    return detect_signals(message).craving_extended
+
+
+def get_request_priority(message, context=None):
+    """Emergency conversations, craving and crisis messages are scheduled ahead of other LLM traffic."""
+    signals = detect_signals(message)
+    if (context or {}).get("conversation_mode") == "emergency" or signals.craving_extended or signals.crisis:
+        return llm_priority.CRISIS
+    return llm_priority.INTERACTIVE
 
 
 def get_chat_history(user_id, limit=10):
@@ -225,33 +261,50 @@ def get_chat_history(user_id, limit=10):
         return []
 
 
-def generate_response(client, prompt):
-    """Generate a response using the Groq model."""
+async def generate_response(messages, deadline=None, priority=llm_priority.INTERACTIVE, raise_errors=False):
+    """
+    Generate a response using the Groq model from a list of chat messages.
+    With a deadline (seconds), the call hedges to the fast model if the
+    primary model has not started answering in time. The priority class
+    decides how the call is queued against other LLM traffic. Failures are
+    answered with an apology unless raise_errors is set.
+    """
     logger.info("Inside generate_response function.")
     try:
         logger.info("Attempting to call Groq chat completion.")
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=GROQ_MODEL,
-            max_tokens=512,
-            temperature=0.7,
-        )
+        if deadline:
+            response = await llm_client.chat_completion_with_deadline(
+                messages=messages,
+                deadline=deadline,
+                model=GROQ_MODEL,
+                max_tokens=512,
+                temperature=0.7,
+                cache=True,
+                priority=priority,
+            )
+        else:
+            response = await llm_client.chat_completion(
+                messages=messages,
+                model=GROQ_MODEL,
+                max_tokens=512,
+                temperature=0.7,
+                cache=True,
+                priority=priority,
+            )
         logger.info("Groq chat completion call finished.")
         
-        if chat_completion.choices and len(chat_completion.choices) > 0:
-            response = chat_completion.choices[0].message.content
+        if response is not None:
             logger.info(f"Model response: {response[:100]}...")
             return response
         else:
             logger.error("No choices in the model response")
+            if raise_errors:
+                raise RuntimeError("No choices in the model response")
             return "I'm sorry, I couldn't generate a response at this time."
     except Exception as e:
         logger.error(f"Error during model generation: {str(e)}", exc_info=True)
+        if raise_errors:
+            raise
         return "I'm experiencing some technical difficulties. Please try again in a moment."
 
 
@@ -354,17 +407,20 @@ def update_knowledge_base(entry):
         return False
 
 
-def prepare_prompt(context, message, chat_history=None):
+def prepare_prompt(context, message, chat_history=None, passages=None):
     """
-    Prepare the prompt for the Groq AI model.
+    Prepare the chat messages for the Groq AI model within the chat token budget.
+    The static system prompt comes first, followed by a user message holding
+    the per-user context, history, passages and the current message.
     
     Args:
         context (dict): The user context
         message (str): The user message
         chat_history (list): Optional recent chat history
+        passages (list): Optional knowledge base passages from RAG
         
     Returns:
-        str: The prepared prompt
+        list: The prepared chat messages
     """
     # Extract relevant context
     user_id = context.get("user_id", "user")
@@ -388,11 +444,8 @@ def prepare_prompt(context, message, chat_history=None):
     caffeine_intake = context.get("caffeine_intake", None)
     alcohol_intake = context.get("alcohol_intake", None)
     
-    # Build the prompt
-    prompt = f"""You are a supportive AI assistant for nicotine recovery. Your goal is to help users quit smoking and stay smoke-free.
-
-User Context:
-- User ID: {user_id}
+    # Build the user context
+    context_text = f"""- User ID: {user_id}
 - Days smoke-free: {days_smoke_free}
 - Current craving level (1-10): {cravings}
 - Stress level (1-10): {stress_level}
@@ -400,66 +453,65 @@ User Context:
 
     # Add optional context if available
     if triggers:
-        prompt += f"- Triggers: {', '.join(triggers)}\n"
+        context_text += f"- Triggers: {', '.join(triggers)}\n"
     if goals:
-        prompt += f"- Goals: {', '.join(goals)}\n"
+        context_text += f"- Goals: {', '.join(goals)}\n"
     if medications:
-        prompt += f"- Medications: {', '.join(medications)}\n"
+        context_text += f"- Medications: {', '.join(medications)}\n"
     if quit_date:
-        prompt += f"- Quit date: {quit_date}\n"
+        context_text += f"- Quit date: {quit_date}\n"
     if last_smoke:
-        prompt += f"- Last smoke: {last_smoke}\n"
+        context_text += f"- Last smoke: {last_smoke}\n"
     if quit_attempts:
-        prompt += f"- Previous quit attempts: {quit_attempts}\n"
+        context_text += f"- Previous quit attempts: {quit_attempts}\n"
     if support_network:
-        prompt += f"- Support network: {', '.join(support_network)}\n"
+        context_text += f"- Support network: {', '.join(support_network)}\n"
     if preferred_coping_strategies:
-        prompt += f"- Preferred coping strategies: {', '.join(preferred_coping_strategies)}\n"
+        context_text += f"- Preferred coping strategies: {', '.join(preferred_coping_strategies)}\n"
     if time_of_day:
-        prompt += f"- Time of day: {time_of_day}\n"
+        context_text += f"- Time of day: {time_of_day}\n"
     if location:
-        prompt += f"- Location: {location}\n"
+        context_text += f"- Location: {location}\n"
     if mood:
-        prompt += f"- Current mood: {mood}\n"
+        context_text += f"- Current mood: {mood}\n"
     if sleep_hours:
-        prompt += f"- Sleep hours: {sleep_hours}\n"
+        context_text += f"- Sleep hours: {sleep_hours}\n"
     if exercise_minutes:
-        prompt += f"- Exercise minutes: {exercise_minutes}\n"
+        context_text += f"- Exercise minutes: {exercise_minutes}\n"
     if water_intake:
-        prompt += f"- Water intake (oz): {water_intake}\n"
+        context_text += f"- Water intake (oz): {water_intake}\n"
     if caffeine_intake:
-        prompt += f"- Caffeine intake (mg): {caffeine_intake}\n"
+        context_text += f"- Caffeine intake (mg): {caffeine_intake}\n"
     if alcohol_intake:
-        prompt += f"- Alcohol intake (drinks): {alcohol_intake}\n"
+        context_text += f"- Alcohol intake (drinks): {alcohol_intake}\n"
     
     # Add recent chat history if available
+    history_text = ""
     if chat_history:
-        prompt += "\nRecent conversation:\n"
         for msg in chat_history[-5:]:  # Last 5 messages for context
             sender = msg.get("sender", "user")
             text = msg.get("text", "")
-            prompt += f"{sender.capitalize()}: {text}\n"
-        prompt += "\n"
+            history_text += f"{sender.capitalize()}: {text}\n"
     
-    # Add the user message
-    prompt += f"\nUser message: {message}\n\n"
+    # Add knowledge base entries if available
+    knowledge_text = ""
+    if passages:
+        for passage in passages:
+            knowledge_text += f"- {passage['text']} (Source: {passage['source']})\n"
     
-    # Add instructions for the AI
-    prompt += """Please provide a helpful, supportive, and informative response. Your response should:
-1. Be empathetic and understanding
-2. Provide evidence-based information when relevant
-3. Offer practical coping strategies
-4. Be encouraging and motivational
-5. Avoid judgment or criticism
-6. Be concise and clear
-7. Focus on the user's specific situation and needs
-
-Your response:"""
+    sections = [
+        PromptSection("instructions", CHAT_SYSTEM_PROMPT, role="system"),
+        PromptSection("user_context", context_text, priority=PRIORITY_CONTEXT, header="User Context:\n"),
+        PromptSection("history", history_text, priority=PRIORITY_HISTORY, header="\nRecent conversation:\n", footer="\n", keep="tail"),
+        PromptSection("passages", knowledge_text, priority=PRIORITY_PASSAGES, header="\nRelevant information from our knowledge base:\n"),
+        PromptSection("message", message, priority=PRIORITY_MESSAGE, header="\nUser message: "),
+    ]
     
-    return prompt
+    messages, _ = assemble_messages(sections, PROMPT_BUDGETS["chat"], endpoint="chat")
+    return messages
 
 
-async def query_groq(user_message: str, context: dict = None) -> str:
+async def query_groq(user_message: str, context: dict = None, priority: str = None, raise_errors: bool = False) -> str:
     """
     Query the Groq API with RAG support for nicotine recovery assistance.
     
@@ -467,6 +519,8 @@ async def query_groq(user_message: str, context: dict = None) -> str:
         user_message (str): The user's message
         context (dict): Optional context about the user (days smoke-free, triggers, etc.)
                        Should include 'user_id' for chat history retrieval
+        priority (str): Optional LLM scheduling class; derived from the message when omitted
+        raise_errors (bool): Raise failures instead of answering with an apology
         
     Returns:
         str: The AI-generated response
@@ -475,6 +529,8 @@ async def query_groq(user_message: str, context: dict = None) -> str:
         # Check if model is initialized
         if not MODEL_OK:
             logger.error("Groq client is not initialized")
+            if raise_errors:
+                raise RuntimeError("Groq client is not initialized")
             return "I'm sorry, I'm having trouble connecting to my AI model right now. Please try again later."
         
         # Ensure context has user_id
@@ -487,20 +543,17 @@ async def query_groq(user_message: str, context: dict = None) -> str:
         user_id = context.get("user_id")
         chat_history = get_chat_history(user_id, limit=5)
         
-        # Prepare the prompt with context, message, and chat history
-        prompt = prepare_prompt(context, user_message, chat_history)
-        
         # Get relevant knowledge base entries using RAG
         passages = retrieve_relevant_passages(user_message, k=3)
         
-        # Add knowledge base entries to the prompt
-        if passages:
-            prompt += "\n\nRelevant information from our knowledge base:\n"
-            for passage in passages:
-                prompt += f"- {passage['text']} (Source: {passage['source']})\n"
+        # Prepare the messages with context, message, chat history and passages
+        messages = prepare_prompt(context, user_message, chat_history, passages)
         
-        # Generate response using the Groq model
-        response = generate_response(client, prompt)
+        # Generate response using the Groq model (emergency mode runs against a deadline)
+        deadline = RESPONSE_DEADLINES["emergency"] if context.get("conversation_mode") == "emergency" else None
+        response = await generate_response(
+            messages, deadline=deadline, priority=priority or get_request_priority(user_message, context), raise_errors=raise_errors
+        )
         
         # Clean up the response
         cleaned_response = clean_response(response)
@@ -512,12 +565,14 @@ async def query_groq(user_message: str, context: dict = None) -> str:
     except Exception as e:
         # Log the error
         logger.error(f"Error in query_groq: {str(e)}")
+        if raise_errors:
+            raise
         return "I'm sorry, I encountered an error while processing your request. Please try again later."
 
 
 def prepare_voice_chat_prompt(context, message, conversation_history):
     """
-    Prepares the prompt for the conversational AI voice chat.
+    Prepares the chat messages for the conversational AI voice chat.
     Formats conversation history for the model.
     """
     # Format conversation history
@@ -549,40 +604,18 @@ def prepare_voice_chat_prompt(context, message, conversation_history):
         stats = context['craving_stats']
         user_context_text += f"\nCraving stats: Total logged: {stats.get('total', 0)}, Avg intensity: {stats.get('average_intensity', 'N/A')}, Last 24h: {stats.get('last_24h', 0)}"
 
-    # Construct the final prompt
-    prompt = f"""
-You are a highly interactive, supportive, and empathetic nicotine recovery coach. Your primary goal is to engage the user in a helpful conversation to overcome cravings and stay smoke-free. Make the conversation feel natural and encouraging.
-
-Context about the user:
-{user_context_text}
-
-Recent chat history:
-{history_text}
-
-Relevant information from our knowledge base:
-###
-{knowledge_text}
-###
-
-User message: {message}
-
-Based on the user's message, their context, and the recent chat history, generate ONLY the assistant's direct response. Do NOT include any introductory phrases, meta-commentary, or instructions to yourself. Keep the response concise, natural, and focused on the user. Respond in a warm, supportive, and conversational tone.
-
-- Be empathetic and validate their feelings.
-- Directly address their current situation, especially if they mention a craving or challenge.
-- If appropriate, briefly offer a relevant piece of information from the knowledge base in a natural, conversational way.
-- If necessary, suggest ONE concrete, actionable coping strategy they can try right now.
-- Ask ONE open-ended, relevant follow-up question to encourage further interaction and show you are listening.
-- Keep your response very short and concise, ideally 1-3 sentences maximum unless the user asks for more information. Ensure the response flows well for spoken language.
-- Avoid repeating the user's message or explicitly stating that you are using the history or context.
-- Do not include any markdown or special formatting.
-- Do not use emojis.
-- Do not end the conversation mid-sentence.
-
-Assistant Response:"""
+    # Construct the messages within the voice token budget
+    sections = [
+        PromptSection("instructions", VOICE_SYSTEM_PROMPT, role="system"),
+        PromptSection("user_context", user_context_text, priority=PRIORITY_CONTEXT, header="Context about the user:\n", footer="\n\n"),
+        PromptSection("history", history_text, priority=PRIORITY_HISTORY, header="Recent chat history:\n", footer="\n", keep="tail"),
+        PromptSection("passages", knowledge_text, priority=PRIORITY_PASSAGES, header="Relevant information from our knowledge base:\n###\n", footer="\n###\n\n"),
+        PromptSection("message", message, priority=PRIORITY_MESSAGE, header="User message: "),
+    ]
+    messages, report = assemble_messages(sections, PROMPT_BUDGETS["voice"], endpoint="voice")
 
-    logger.info(f"Prepared voice chat prompt: {prompt[:500]}...") # Log start of prompt
-    return prompt
+    logger.info(f"Prepared voice chat messages ({report['total_tokens']} tokens): {messages[-1]['content'][:500]}...") # Log start of user turn
+    return messages
 
 
 async def query_groq_voice(context: dict, message: str, conversation_history: list):
@@ -603,14 +636,14 @@ async def query_groq_voice(context: dict, message: str, conversation_history: li
             logger.error("Groq client is not initialized")
             return "I'm sorry, I'm having trouble connecting to my AI model right now. Please try again later."
         
-        # Prepare the prompt with context, message, and history
+        # Prepare the messages with context, message, and history
         logger.info("Preparing voice chat prompt.")
-        prompt = prepare_voice_chat_prompt(context, message, conversation_history)
-        logger.info(f"Prompt prepared. Length: {len(prompt)}")
+        messages = prepare_voice_chat_prompt(context, message, conversation_history)
+        logger.info(f"Prompt prepared. Messages: {len(messages)}")
         
         # Generate response using the Groq model
         logger.info("Generating response with Groq model.")
-        response = generate_response(client, prompt)
+        response = await generate_response(messages, deadline=RESPONSE_DEADLINES["voice"], priority=get_request_priority(message, context))
         logger.info("Response generation complete.")
         
         # Clean up the response
@@ -637,28 +670,21 @@ async def chat_with_document_groq(document_text: str, question: str, chat_histor
     # Format chat history for the prompt
     history_text = "\n".join([f"{msg['sender'].capitalize()}: {msg['text']}" for msg in chat_history])
 
-    prompt = f"""
-You are a helpful AI assistant that answers questions about the provided medical document. Use only the information from the document and the provided analysis context to answer.
-
-Document Text:
-{document_text}
-
-{analysis_context}
-
-Chat History:
-{history_text}
-
-User Question: {question}
-
-Based on the document text, the provided analysis context, and chat history, answer the user's question. If the answer is not in the document or the analysis context, state that you cannot find the information.
-
-Assistant Response:"""
+    # The document excerpt and history are trimmed to the document chat token budget
+    sections = [
+        PromptSection("instructions", DOCUMENT_CHAT_SYSTEM_PROMPT, role="system"),
+        PromptSection("document", document_text, priority=PRIORITY_PASSAGES, header="Document Text:\n", footer="\n\n"),
+        PromptSection("analysis_context", analysis_context, priority=PRIORITY_CONTEXT, footer="\n\n"),
+        PromptSection("history", history_text, priority=PRIORITY_HISTORY, header="Chat History:\n", footer="\n\n", keep="tail"),
+        PromptSection("message", question, priority=PRIORITY_MESSAGE, header="User Question: "),
+    ]
+    messages, _ = assemble_messages(sections, PROMPT_BUDGETS["document_chat"], endpoint="document_chat")
 
     logger.info(f"Sending chat prompt to Groq. Document text length: {len(document_text)}, Question: {question}, Analysis context length: {len(analysis_context)}")
-    logger.debug(f"Chat Prompt: {prompt[:500]}...")
+    logger.debug(f"Chat Prompt: {messages[-1]['content'][:500]}...")
 
     try:
-        raw_response = generate_response(client, prompt)
+        raw_response = await generate_response(messages)
         logger.info("Received raw response from Groq for chat.")
         logger.debug(f"Raw Chat Response: {raw_response[:500]}...")
 
@@ -674,48 +700,46 @@ Assistant Response:"""
 
 async def query_groq_streaming(user_message: str, context: dict = None):
     """
-    Query the Groq API with streaming support (for future use).
+    Query the Groq API with streaming support.
     
     Args:
         user_message (str): The user's message
         context (dict): Optional context about the user
+                       Should include 'user_id' for chat history retrieval
         
     Yields:
         str: Chunks of the AI-generated response
+
+    Raises:
+        Exception: Failures are raised, not answered with an apology, so the
+            caller can tell an error from the model's reply
     """
     try:
         if not MODEL_OK:
-            yield "I'm sorry, I'm having trouble connecting to my AI model right now."
-            return
+            raise llm_client.LLMUnavailableError("Groq client is not initialized")
+        
+        context = context or {}
         
-        # Prepare the prompt with context and message
-        prompt = prepare_prompt(context or {}, user_message)
+        # Get chat history from the centralized chat service
+        chat_history = get_chat_history(context.get("user_id", "user"), limit=5)
         
         # Get relevant knowledge base entries using RAG
         passages = retrieve_relevant_passages(user_message, k=3)
         
-        # Add knowledge base entries to the prompt
-        if passages:
-            prompt += "\n\nRelevant information from our knowledge base:\n"
-            for passage in passages:
-                prompt += f"- {passage['text']} (Source: {passage['source']})\n"
+        # Prepare the messages with context, message, chat history and passages
+        messages = prepare_prompt(context, user_message, chat_history, passages)
         
         # Stream response from Groq
-        stream = client.chat.completions.create(
+        async for token in llm_client.stream_chat_completion(
+            messages=messages,
             model=GROQ_MODEL,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
             temperature=0.7,
             max_tokens=1024,
             top_p=0.9,
-            stream=True
-        )
-        
-        for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+            priority=get_request_priority(user_message, context),
+        ):
+            yield token
                 
     except Exception as e:
         logger.error(f"Error in query_groq_streaming: {str(e)}")
-        yield "I'm sorry, I encountered an error while processing your request."
+        raise
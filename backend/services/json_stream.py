@@ -0,0 +1,131 @@
+"""
+Incremental parser for a JSON object that arrives in pieces.
+
+Used to surface the fields of a streamed LLM answer as soon as each one is
+syntactically complete, instead of waiting for the whole completion. Text
+before the opening brace (e.g. a stray ```json fence) is ignored.
+"""
+
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalJSONParser:
+    """
+    Feed text with feed(); it returns the events completed by that text:
+
+    - ("item", key, value) for each element of a top-level array field
+    - ("field", key, value) for each top-level field once its value is complete
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"  # key -> colon -> value -> comma, at depth 1
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self._value_is_array = False
+        self._item_start = None
+
+    def _load(self, start, end):
+        text = self.buffer[start:end].strip()
+        if not text:
+            return None, False
+        try:
+            return json.loads(text), True
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparseable streamed JSON value {text[:80]!r}: {e}")
+            return None, False
+
+    def _finish_item(self, pos, events):
+        if self._item_start is not None:
+            value, ok = self._load(self._item_start, pos)
+            if ok:
+                events.append(("item", self._key, value))
+        self._item_start = None
+
+    def _finish_field(self, pos, events):
+        if self._key is not None and self._value_start is not None:
+            value, ok = self._load(self._value_start, pos)
+            if ok:
+                self.fields[self._key] = value
+                events.append(("field", self._key, value))
+        self._key = None
+        self._value_start = None
+        self._value_is_array = False
+        self._expect = "key"
+
+    def feed(self, text):
+        """
+        Consume more text.
+
+        Returns:
+            list: Events completed by this text, in order
+        """
+        events = []
+        self.buffer += text
+        buffer = self.buffer
+        for pos in range(self._pos, len(buffer)):
+            c = buffer[pos]
+            if self.done:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key" and self._key_start is not None:
+                        try:
+                            self._key = json.loads(buffer[self._key_start:pos + 1])
+                        except json.JSONDecodeError:
+                            self._key = None
+                        self._key_start = None
+                        self._expect = "colon"
+                continue
+            if self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                continue
+            if c.isspace():
+                continue
+
+            # Mark where a field value or an array element starts
+            if self._depth == 1 and self._expect == "value":
+                self._value_start = pos
+                self._value_is_array = c == "["
+                self._expect = "comma"
+            elif self._depth == 2 and self._value_is_array and self._item_start is None and c not in ",]":
+                self._item_start = pos
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._key_start = pos
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 2 and self._value_is_array:
+                    self._finish_item(pos, events)
+                self._depth -= 1
+                if self._depth == 0:
+                    self._finish_field(pos, events)
+                    self.done = True
+            elif c == ",":
+                if self._depth == 1:
+                    self._finish_field(pos, events)
+                elif self._depth == 2 and self._value_is_array:
+                    self._finish_item(pos, events)
+            elif c == ":" and self._depth == 1 and self._expect == "colon":
+                self._expect = "value"
+        self._pos = len(buffer)
+        return events
@@ -0,0 +1,102 @@
+"""
+Exact-match response cache for LLM completions.
+
+Entries are keyed by a SHA-256 hash of the model, the sampling parameters and
+the normalized messages, bounded in size (LRU eviction) and expire after a TTL.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "600"))
+
+
+def normalize_text(text):
+    """Collapse whitespace so prompts that differ only in layout share a key."""
+    return " ".join(text.split())
+
+
+def make_cache_key(model, messages, **params):
+    """
+    Build a stable cache key for a completion request.
+
+    Args:
+        model (str): The model name
+        messages (list): Chat messages in OpenAI/Groq format
+        **params: Sampling parameters (max_tokens, temperature, ...)
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    normalized_messages = [
+        {"role": m.get("role", "user"), "content": normalize_text(m.get("content") or "")}
+        for m in messages
+    ]
+    payload = json.dumps(
+        {"model": model, "messages": normalized_messages, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache instance used by services/llm_client.py
+response_cache = ResponseCache()
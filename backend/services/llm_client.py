@@ -0,0 +1,376 @@
+"""
+Shared async LLM client for the Nicotine Recovery AI Assistant.
+
+All Groq chat completions go through this module so that a single uvicorn
+worker can keep many completions in flight without blocking the event loop.
+
+- AsyncGroq clients for one or more API keys sharing a pooled keep-alive
+  httpx.AsyncClient, scheduled by rate-limit headroom (see services/llm_keys.py)
+- A priority scheduler (crisis > interactive > bulk) with per-class shares of
+  upstream capacity (see services/llm_priority.py); calls over capacity queue
+  for at most their class's wait and then fail fast
+- A circuit breaker and an AIMD concurrency limiter capped at LLM_MAX_CONCURRENCY
+  (see services/llm_resilience.py) whose current limit is the scheduler's capacity
+- Per-call timeouts (LLM_TIMEOUT_SECONDS, overridable per call)
+- An opt-in exact-match response cache (see services/llm_cache.py)
+- Single-flight coalescing of identical in-flight requests (see services/llm_singleflight.py)
+- Deadline-aware generation that hedges to a fast model when the first token is late
+"""
+
+import os
+import asyncio
+import logging
+import contextlib
+import httpx
+from dotenv import load_dotenv
+from groq import AsyncGroq, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from services.llm_cache import response_cache, make_cache_key
+from services.llm_singleflight import llm_singleflight
+from services.llm_resilience import CircuitBreaker, AdaptiveLimiter, LLMOverloadedError
+from services.llm_keys import KeyPool, load_api_keys
+from services import llm_priority
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+# Override to target a Groq-compatible server such as llm_simulator.py
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+# Connection pool / concurrency settings
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "32"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+# SDK-level retries; 429s are retried across keys by the key pool instead
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "0"))
+# Retries of a completion after a 5xx response or a dropped connection, with exponential backoff
+LLM_TRANSIENT_RETRIES = int(os.getenv("LLM_TRANSIENT_RETRIES", "2"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("LLM_RETRY_BACKOFF_SECONDS", "0.25"))
+# Fraction of a request deadline to wait for the primary model's first token before hedging
+LLM_HEDGE_FRACTION = float(os.getenv("LLM_HEDGE_FRACTION", "0.35"))
+
+
+class LLMUnavailableError(Exception):
+    """Raised when no LLM client is configured or a call cannot be completed."""
+
+
+def _build_http_client():
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+    )
+
+
+# Initialize the shared async Groq clients, one per API key
+http_client = None
+key_pool = None
+try:
+    api_keys = load_api_keys()
+    if api_keys:
+        http_client = _build_http_client()
+        key_pool = KeyPool(
+            api_keys,
+            lambda key: AsyncGroq(api_key=key, base_url=GROQ_BASE_URL, http_client=http_client, max_retries=LLM_MAX_RETRIES),
+            rate_limit_error=RateLimitError,
+        )
+        MODEL_OK = True
+        logger.info(f"Initialized shared async Groq clients (model: {GROQ_MODEL}, keys: {len(key_pool)}, max concurrency: {LLM_MAX_CONCURRENCY}, base URL: {GROQ_BASE_URL or 'default'})")
+    else:
+        logger.error("GROQ_API_KEY not found in environment variables")
+        MODEL_OK = False
+except Exception as e:
+    logger.error(f"Async Groq client initialization failed: {e}")
+    key_pool = None
+    MODEL_OK = False
+
+# Guards every upstream call on this worker; the scheduler admits calls up to
+# the limiter's current AIMD limit, so the limit is enforced in one place
+circuit_breaker = CircuitBreaker()
+concurrency_limiter = AdaptiveLimiter(max_limit=LLM_MAX_CONCURRENCY)
+priority_scheduler = llm_priority.PriorityScheduler(lambda: concurrency_limiter.limit)
+
+# Hedged request counters
+_hedge_stats = {"deadline_requests": 0, "hedges": 0, "hedge_wins": 0, "deadline_misses": 0}
+
+
+def _require_key_pool():
+    if key_pool is None:
+        raise LLMUnavailableError("Groq client is not initialized")
+    return key_pool
+
+
+def _is_upstream_failure(error):
+    """Timeouts, connection errors, 429s and 5xx responses indicate an unhealthy upstream."""
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _is_transient_failure(error):
+    """5xx responses and connection errors other than timeouts are worth retrying."""
+    if isinstance(error, APITimeoutError):
+        return False
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+@contextlib.asynccontextmanager
+async def _guarded_call(priority=llm_priority.INTERACTIVE):
+    """Admit a call by priority within the limiter's limit, check the circuit breaker, and record its outcome."""
+    async with priority_scheduler.slot(priority):
+        async with _limited_call():
+            yield
+
+
+@contextlib.asynccontextmanager
+async def _limited_call():
+    if not circuit_breaker.allow():
+        raise LLMOverloadedError("LLM circuit breaker is open")
+    concurrency_limiter.acquire()
+    try:
+        yield
+    except (asyncio.CancelledError, GeneratorExit):
+        circuit_breaker.record_cancel()
+        concurrency_limiter.release()
+        raise
+    except Exception as e:
+        if _is_upstream_failure(e):
+            circuit_breaker.record_failure()
+            concurrency_limiter.release("failure")
+        else:
+            circuit_breaker.record_success()
+            concurrency_limiter.release()
+        raise
+    else:
+        circuit_breaker.record_success()
+        concurrency_limiter.release("success")
+
+
+async def chat_completion(messages, model=None, max_tokens=512, temperature=0.7, timeout=None, cache=False, coalesce=True, priority=llm_priority.INTERACTIVE, **kwargs):
+    """
+    Run a chat completion and return the text of the first choice.
+
+    Args:
+        messages (list): Chat messages in OpenAI/Groq format
+        model (str): Model name, defaults to GROQ_MODEL
+        max_tokens (int): Maximum completion tokens
+        temperature (float): Sampling temperature
+        timeout (float): Per-call timeout in seconds, defaults to LLM_TIMEOUT_SECONDS
+        cache (bool): Serve repeated identical requests from the response cache
+        coalesce (bool): Share one upstream call between identical concurrent requests
+        priority (str): Scheduling class: llm_priority.CRISIS, INTERACTIVE or BULK
+
+    Returns:
+        str or None: The completion text, or None if the model returned no choices
+    """
+    model = model or GROQ_MODEL
+    request_key = None
+    if cache or coalesce:
+        request_key = make_cache_key(model, messages, max_tokens=max_tokens, temperature=temperature, **kwargs)
+    if cache:
+        cached = response_cache.get(request_key)
+        if cached is not None:
+            logger.info("LLM response cache hit.")
+            return cached
+
+    async def call():
+        content = await _create_completion(messages, model, max_tokens, temperature, timeout, priority=priority, **kwargs)
+        if cache and content:
+            response_cache.set(request_key, content)
+        return content
+
+    if coalesce:
+        return await llm_singleflight.do(request_key, call)
+    return await call()
+
+
+async def _create_completion(messages, model, max_tokens, temperature, timeout, priority=llm_priority.INTERACTIVE, **kwargs):
+    pool = _require_key_pool()
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+
+    def call(llm):
+        return llm.chat.completions.with_raw_response.create(
+            messages=messages,
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            **kwargs,
+        )
+
+    for attempt in range(LLM_TRANSIENT_RETRIES + 1):
+        try:
+            # Each attempt is admitted and recorded separately, so failed ones still back off the limiter
+            async with _guarded_call(priority):
+                raw = await asyncio.wait_for(pool.run(call), timeout=timeout)
+                chat_completion = await raw.parse()
+            break
+        except Exception as e:
+            if attempt == LLM_TRANSIENT_RETRIES or not _is_transient_failure(e):
+                raise
+            delay = LLM_RETRY_BACKOFF_SECONDS * 2 ** attempt
+            logger.warning(f"Transient LLM error ({e}); retrying in {delay:.2f}s ({attempt + 1}/{LLM_TRANSIENT_RETRIES})")
+            await asyncio.sleep(delay)
+    if chat_completion.choices and len(chat_completion.choices) > 0:
+        return chat_completion.choices[0].message.content
+    return None
+
+
+async def stream_chat_completion(messages, model=None, max_tokens=1024, temperature=0.7, timeout=None, priority=llm_priority.INTERACTIVE, **kwargs):
+    """
+    Stream a chat completion, yielding content deltas as they arrive.
+
+    The concurrency slot is held for the lifetime of the stream.
+    """
+    pool = _require_key_pool()
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+
+    def call(llm):
+        return llm.chat.completions.with_raw_response.create(
+            messages=messages,
+            model=model or GROQ_MODEL,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout,
+            stream=True,
+            **kwargs,
+        )
+
+    async with _guarded_call(priority):
+        raw = await asyncio.wait_for(pool.run(call), timeout=timeout)
+        stream = await raw.parse()
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def _collect_stream(messages, model, max_tokens, temperature, timeout, first_token, priority=llm_priority.INTERACTIVE, **kwargs):
+    """Run a streaming completion to the end, signalling first_token on the first delta."""
+    chunks = []
+    async for token in stream_chat_completion(messages, model=model, max_tokens=max_tokens, temperature=temperature, timeout=timeout, priority=priority, **kwargs):
+        if not first_token.is_set():
+            first_token.set()
+        chunks.append(token)
+    return "".join(chunks)
+
+
+async def chat_completion_with_deadline(messages, deadline, model=None, fallback_model=None, hedge_fraction=None, max_tokens=512, temperature=0.7, cache=False, priority=llm_priority.INTERACTIVE, **kwargs):
+    """
+    Run a chat completion that must finish within a latency deadline.
+
+    The primary model is streamed so its first token can be observed. If no
+    token has arrived after hedge_fraction * deadline, a hedged request is sent
+    to the fast fallback model and whichever answer completes first wins.
+
+    Args:
+        messages (list): Chat messages in OpenAI/Groq format
+        deadline (float): Overall latency budget in seconds
+        model (str): Primary model, defaults to GROQ_MODEL
+        fallback_model (str): Hedge model, defaults to GROQ_FAST_MODEL
+        hedge_fraction (float): Fraction of the deadline to wait before hedging
+        cache (bool): Serve repeated identical requests from the response cache
+        priority (str): Scheduling class: llm_priority.CRISIS, INTERACTIVE or BULK
+
+    Returns:
+        str or None: The completion text of the winning request
+
+    Raises:
+        asyncio.TimeoutError: If neither request finished within the deadline
+    """
+    model = model or GROQ_MODEL
+    fallback_model = fallback_model or GROQ_FAST_MODEL
+    hedge_fraction = LLM_HEDGE_FRACTION if hedge_fraction is None else hedge_fraction
+    _hedge_stats["deadline_requests"] += 1
+
+    cache_key = None
+    if cache:
+        cache_key = make_cache_key(model, messages, max_tokens=max_tokens, temperature=temperature, **kwargs)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("LLM response cache hit.")
+            return cached
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    expires_at = started + deadline
+    first_token = asyncio.Event()
+    primary = asyncio.ensure_future(
+        _collect_stream(messages, model, max_tokens, temperature, deadline, first_token, priority=priority, **kwargs)
+    )
+    token_waiter = asyncio.ensure_future(first_token.wait())
+    tasks = {primary}
+    hedge = None
+    errors = []
+    try:
+        # Wait for the first token, or for the primary to finish or fail early
+        await asyncio.wait({primary, token_waiter}, timeout=deadline * hedge_fraction, return_when=asyncio.FIRST_COMPLETED)
+        if not first_token.is_set() and fallback_model != model:
+            logger.warning(f"No first token from {model} after {loop.time() - started:.2f}s, hedging to {fallback_model}.")
+            _hedge_stats["hedges"] += 1
+            hedge = asyncio.ensure_future(
+                _create_completion(messages, fallback_model, max_tokens, temperature, max(expires_at - loop.time(), 0.1), priority=priority, **kwargs)
+            )
+            tasks.add(hedge)
+
+        while tasks:
+            remaining = expires_at - loop.time()
+            if remaining <= 0:
+                break
+            done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                if task.exception() is not None:
+                    logger.error(f"Deadline request failed: {task.exception()}")
+                    errors.append(task.exception())
+                    continue
+                content = task.result()
+                if not content:
+                    continue
+                if task is hedge:
+                    _hedge_stats["hedge_wins"] += 1
+                elif cache_key is not None:
+                    response_cache.set(cache_key, content)
+                return content
+
+        if not tasks and errors:
+            # Every request failed before the deadline
+            raise errors[0]
+        if not tasks:
+            return None
+        _hedge_stats["deadline_misses"] += 1
+        raise asyncio.TimeoutError(f"LLM request exceeded its {deadline}s deadline")
+    finally:
+        for task in (primary, hedge, token_waiter):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def get_stats():
+    """Runtime metrics for the LLM client layer."""
+    return {
+        "model_ok": MODEL_OK,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "circuit_breaker": circuit_breaker.stats(),
+        "concurrency_limiter": concurrency_limiter.stats(),
+        "priority_queues": priority_scheduler.stats(),
+        "cache": response_cache.stats(),
+        "singleflight": llm_singleflight.stats(),
+        "hedging": dict(_hedge_stats),
+        "api_keys": key_pool.stats() if key_pool is not None else [],
+    }
+
+
+async def aclose():
+    """Close the pooled HTTP connections (called on application shutdown)."""
+    if http_client is not None:
+        await http_client.aclose()
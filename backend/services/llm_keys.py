@@ -0,0 +1,196 @@
+"""
+Rate-limit-aware scheduling across several Groq API keys.
+
+Each key keeps its remaining request/token budget from the x-ratelimit-*
+response headers. Calls go to the key with the most headroom; a 429 puts the
+key on cool-down for its Retry-After and the call moves to another key, or
+waits with jittered backoff when every key is cooling down.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_KEY_MAX_ATTEMPTS = int(os.getenv("LLM_KEY_MAX_ATTEMPTS", "4"))
+LLM_KEY_MAX_WAIT_SECONDS = float(os.getenv("LLM_KEY_MAX_WAIT_SECONDS", "10"))
+LLM_KEY_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_KEY_BACKOFF_BASE_SECONDS", "0.25"))
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def load_api_keys():
+    """Read GROQ_API_KEYS (comma-separated), falling back to GROQ_API_KEY."""
+    keys = [k.strip() for k in os.getenv("GROQ_API_KEYS", "").split(",") if k.strip()]
+    single = os.getenv("GROQ_API_KEY")
+    if not keys and single:
+        keys = [single]
+    return keys
+
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset value such as "7.66s", "2m59.56s" or "120ms".
+
+    Returns:
+        float or None: Seconds, or None if the value cannot be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers, name):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+class APIKeyState:
+    """Rate-limit bookkeeping for one API key and its client."""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self.limit_requests = None
+        self.remaining_requests = None
+        self.requests_reset_at = 0.0
+        self.limit_tokens = None
+        self.remaining_tokens = None
+        self.tokens_reset_at = 0.0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+
+    def headroom(self, now):
+        """Fraction of the tightest budget still available (0..1), or -1 while cooling down."""
+        if now < self.cooldown_until:
+            return -1.0
+        fractions = []
+        if self.limit_requests and self.remaining_requests is not None and now < self.requests_reset_at:
+            fractions.append(self.remaining_requests / self.limit_requests)
+        if self.limit_tokens and self.remaining_tokens is not None and now < self.tokens_reset_at:
+            fractions.append(self.remaining_tokens / self.limit_tokens)
+        # Unknown or already reset budgets count as full; spread load by in-flight calls
+        return (min(fractions) if fractions else 1.0) / (1 + self.in_flight)
+
+    def update_from_headers(self, headers, now):
+        self.limit_requests = _header_int(headers, "x-ratelimit-limit-requests") or self.limit_requests
+        self.limit_tokens = _header_int(headers, "x-ratelimit-limit-tokens") or self.limit_tokens
+        remaining_requests = _header_int(headers, "x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0)
+        remaining_tokens = _header_int(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 60.0)
+
+    def stats(self, now):
+        return {
+            "key": self.name,
+            "remaining_requests": self.remaining_requests,
+            "remaining_tokens": self.remaining_tokens,
+            "cooling_down_for": round(max(self.cooldown_until - now, 0.0), 2),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class KeyPool:
+    """Schedules calls onto the API key with the most rate-limit headroom."""
+
+    def __init__(self, keys, client_factory, rate_limit_error=Exception):
+        self.keys = [
+            APIKeyState(f"key{i + 1}...{key[-4:]}", client_factory(key))
+            for i, key in enumerate(keys)
+        ]
+        self.rate_limit_error = rate_limit_error
+
+    def __len__(self):
+        return len(self.keys)
+
+    def pick(self):
+        """Return the key with the most headroom, or None if every key is cooling down."""
+        now = time.monotonic()
+        best = max(self.keys, key=lambda k: k.headroom(now), default=None)
+        if best is None or best.headroom(now) < 0:
+            return None
+        return best
+
+    def _retry_after(self, error):
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        return (
+            parse_duration(headers.get("retry-after"))
+            or parse_duration(headers.get("x-ratelimit-reset-requests"))
+            or parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            or 1.0
+        )
+
+    async def run(self, call):
+        """
+        Run call(client) on the best key, retrying 429s on other keys.
+
+        Args:
+            call (callable): Coroutine function taking an AsyncGroq client and
+                returning a raw response (with .headers)
+
+        Returns:
+            The raw response of the first successful attempt
+        """
+        last_error = None
+        waited = 0.0
+        for attempt in range(LLM_KEY_MAX_ATTEMPTS):
+            key = self.pick()
+            if key is None:
+                now = time.monotonic()
+                wait = min(k.cooldown_until for k in self.keys) - now
+                # Jitter so that waiters released by the same reset do not stampede
+                wait = max(wait, 0.0) + random.uniform(0, LLM_KEY_BACKOFF_BASE_SECONDS * (2 ** attempt))
+                if waited + wait > LLM_KEY_MAX_WAIT_SECONDS:
+                    break
+                logger.warning(f"All Groq API keys are rate limited, backing off {wait:.2f}s.")
+                await asyncio.sleep(wait)
+                waited += wait
+                key = self.pick()
+                if key is None:
+                    continue
+            key.in_flight += 1
+            key.calls += 1
+            try:
+                raw = await call(key.client)
+            except self.rate_limit_error as e:
+                retry_after = self._retry_after(e)
+                key.rate_limited += 1
+                key.cooldown_until = time.monotonic() + retry_after
+                logger.warning(f"Groq API {key.name} rate limited, cooling down for {retry_after:.2f}s.")
+                last_error = e
+                continue
+            finally:
+                key.in_flight -= 1
+            key.update_from_headers(raw.headers, time.monotonic())
+            return raw
+        if last_error is not None:
+            raise last_error
+        raise asyncio.TimeoutError("Timed out waiting for a Groq API key to become available")
+
+    def stats(self):
+        now = time.monotonic()
+        return [k.stats(now) for k in self.keys]
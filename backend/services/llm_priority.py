@@ -0,0 +1,150 @@
+"""
+Priority scheduling for upstream LLM calls.
+
+Requests are admitted in three classes, highest priority first:
+
+- crisis: emergency conversations and craving messages
+- interactive: ordinary chat, voice and document questions
+- bulk: document analysis and other background work
+
+Each class may only occupy its share of the current upstream capacity, and
+queued requests are dispatched strictly by class, so bursts of bulk work can
+never take the slots a crisis request needs.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextlib
+from collections import deque
+from services.llm_resilience import LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+
+CRISIS = "crisis"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITY_ORDER = (CRISIS, INTERACTIVE, BULK)
+
+# Maximum fraction of upstream capacity each class may occupy
+CLASS_SHARES = {
+    CRISIS: float(os.getenv("LLM_SHARE_CRISIS", "1.0")),
+    INTERACTIVE: float(os.getenv("LLM_SHARE_INTERACTIVE", "0.7")),
+    BULK: float(os.getenv("LLM_SHARE_BULK", "0.25")),
+}
+
+# Longest time a request may wait in its queue before failing fast
+CLASS_MAX_WAIT_SECONDS = {
+    CRISIS: float(os.getenv("LLM_QUEUE_WAIT_CRISIS", "10")),
+    INTERACTIVE: float(os.getenv("LLM_QUEUE_WAIT_INTERACTIVE", "10")),
+    BULK: float(os.getenv("LLM_QUEUE_WAIT_BULK", "120")),
+}
+
+LLM_QUEUE_MAX_DEPTH = int(os.getenv("LLM_QUEUE_MAX_DEPTH", "256"))
+
+
+class PriorityScheduler:
+    """Admits calls by priority class within per-class concurrency shares."""
+
+    def __init__(self, capacity_fn, shares=None, max_wait=None, max_queue_depth=LLM_QUEUE_MAX_DEPTH):
+        """
+        Args:
+            capacity_fn (callable): Returns the current total number of upstream slots
+            shares (dict): Maximum fraction of capacity per class
+            max_wait (dict): Maximum queueing time in seconds per class
+            max_queue_depth (int): Queued requests per class before rejecting
+        """
+        self.capacity_fn = capacity_fn
+        self.shares = shares or CLASS_SHARES
+        self.max_wait = max_wait or CLASS_MAX_WAIT_SECONDS
+        self.max_queue_depth = max_queue_depth
+        self._queues = {cls: deque() for cls in PRIORITY_ORDER}
+        self.in_flight = {cls: 0 for cls in PRIORITY_ORDER}
+        self._counters = {
+            cls: {"admitted": 0, "rejected": 0, "timed_out": 0, "max_queue_depth": 0, "wait_seconds": 0.0}
+            for cls in PRIORITY_ORDER
+        }
+
+    def _class_limit(self, cls, capacity):
+        return max(1, int(capacity * self.shares.get(cls, 1.0)))
+
+    def _can_start(self, cls):
+        capacity = max(1, int(self.capacity_fn()))
+        return (
+            sum(self.in_flight.values()) < capacity
+            and self.in_flight[cls] < self._class_limit(cls, capacity)
+        )
+
+    def _has_waiters_at_or_above(self, cls):
+        for other in PRIORITY_ORDER:
+            if self._queues[other]:
+                return True
+            if other == cls:
+                return False
+        return False
+
+    def _dispatch(self):
+        for cls in PRIORITY_ORDER:
+            queue = self._queues[cls]
+            while queue and self._can_start(cls):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight[cls] += 1
+                waiter.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, cls=INTERACTIVE):
+        """Hold one upstream slot for the given priority class."""
+        if cls not in self._queues:
+            cls = INTERACTIVE
+        counters = self._counters[cls]
+        if not self._has_waiters_at_or_above(cls) and self._can_start(cls):
+            self.in_flight[cls] += 1
+        else:
+            queue = self._queues[cls]
+            if len(queue) >= self.max_queue_depth:
+                counters["rejected"] += 1
+                raise LLMOverloadedError(f"LLM {cls} queue is full")
+            waiter = asyncio.get_running_loop().create_future()
+            queue.append(waiter)
+            counters["max_queue_depth"] = max(counters["max_queue_depth"], len(queue))
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(waiter, timeout=self.max_wait.get(cls))
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was granted as the wait ended; hand it back
+                    self.in_flight[cls] -= 1
+                    self._dispatch()
+                else:
+                    with contextlib.suppress(ValueError):
+                        queue.remove(waiter)
+                if isinstance(e, asyncio.TimeoutError):
+                    counters["timed_out"] += 1
+                    raise LLMOverloadedError(f"Timed out waiting in the LLM {cls} queue")
+                raise
+            finally:
+                counters["wait_seconds"] += time.monotonic() - started
+        counters["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.in_flight[cls] -= 1
+            self._dispatch()
+
+    def stats(self):
+        capacity = max(1, int(self.capacity_fn()))
+        return {
+            "capacity": capacity,
+            "classes": {
+                cls: {
+                    "queue_depth": len(self._queues[cls]),
+                    "in_flight": self.in_flight[cls],
+                    "limit": self._class_limit(cls, capacity),
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in self._counters[cls].items()},
+                }
+                for cls in PRIORITY_ORDER
+            },
+        }
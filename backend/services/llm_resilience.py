@@ -0,0 +1,129 @@
+"""
+Circuit breaker and adaptive concurrency limiter for upstream LLM calls.
+
+- CircuitBreaker opens after consecutive upstream failures so later requests
+  fail fast, then lets a single probe through after a cool-down.
+- AdaptiveLimiter keeps an AIMD limit on in-flight calls: it grows by roughly
+  one slot per window of successful calls and halves on each upstream failure.
+  The limit is the capacity of the priority scheduler (services/llm_priority.py),
+  which queues calls over it for at most their class's maximum wait.
+"""
+
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_LIMIT_INITIAL = int(os.getenv("LLM_LIMIT_INITIAL", "16"))
+LLM_LIMIT_MIN = int(os.getenv("LLM_LIMIT_MIN", "1"))
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a call is rejected by the circuit breaker or concurrency limiter."""
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open probe -> closed."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD, reset_timeout=LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def allow(self):
+        """Return True if a call may proceed."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            logger.info("LLM circuit breaker half-open, sending probe request.")
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info("LLM circuit breaker closed after successful probe.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures.")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancel(self):
+        """A call was cancelled before an outcome was known."""
+        self._probe_in_flight = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on in-flight calls.
+
+    Admission against the limit is left to the priority scheduler; the limiter
+    counts admitted calls and adapts the limit from their outcomes. After a
+    decrease, calls already admitted finish and no new call starts until
+    in_flight drops below the new limit.
+    """
+
+    def __init__(self, initial=LLM_LIMIT_INITIAL, min_limit=LLM_LIMIT_MIN, max_limit=None, backoff=0.5):
+        self.max_limit = max_limit or initial
+        self.min_limit = min_limit
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.backoff = backoff
+        self.in_flight = 0
+
+    def acquire(self):
+        """Count a call admitted by the scheduler."""
+        self.in_flight += 1
+
+    def release(self, outcome=None):
+        """
+        Return a slot and adapt the limit.
+
+        Args:
+            outcome (str): "success", "failure" or None for a neutral release
+        """
+        self.in_flight = max(self.in_flight - 1, 0)
+        if outcome == "success":
+            self.limit = min(self.limit + 1.0 / self.limit, float(self.max_limit))
+        elif outcome == "failure":
+            self.limit = max(self.limit * self.backoff, float(self.min_limit))
+
+    def stats(self):
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+        }
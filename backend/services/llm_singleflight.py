@@ -0,0 +1,62 @@
+"""
+Single-flight coalescing for identical concurrent LLM requests.
+
+While a request for a given key is in flight, later callers with the same key
+wait on the same upstream call instead of issuing their own, and every waiter
+receives the same result (or exception).
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Merges concurrent calls that share a key into one execution."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """
+        Run fn() once per key among concurrent callers.
+
+        Args:
+            key (str): Identity of the request
+            fn (callable): Zero-argument coroutine function performing the call
+
+        Returns:
+            The result of fn(), shared with every concurrent caller for key
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.coalesced += 1
+            logger.info("Coalesced identical in-flight LLM request.")
+        # Shield so that one waiter disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter has gone away
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# Shared instance used by services/llm_client.py
+llm_singleflight = SingleFlight()
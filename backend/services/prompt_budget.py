@@ -0,0 +1,184 @@
+"""
+Token-budgeted prompt assembly.
+
+Prompts are built from named sections (instructions, user context, history,
+knowledge passages, document excerpt, ...). Each endpoint has a token budget;
+sections are funded in priority order and lower-priority sections are
+truncated or dropped when the budget runs out. The rendered prompt keeps the
+original section order. Sections carry a chat role so the same budgeting can
+produce a `messages` array whose leading system message is byte-stable.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+
+# tiktoken is optional; fall back to a regex approximation when it is missing
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Per-endpoint input token budgets
+PROMPT_BUDGETS = {
+    "chat": int(os.getenv("PROMPT_BUDGET_CHAT", "3000")),
+    "voice": int(os.getenv("PROMPT_BUDGET_VOICE", "1500")),
+    "document_chat": int(os.getenv("PROMPT_BUDGET_DOCUMENT_CHAT", "6000")),
+}
+
+# Section priorities: lower numbers are funded first
+PRIORITY_REQUIRED = 0
+PRIORITY_MESSAGE = 1
+PRIORITY_CONTEXT = 2
+PRIORITY_HISTORY = 3
+PRIORITY_PASSAGES = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, using approximate token counts: {e}")
+
+
+def count_tokens(text):
+    """Count tokens in text with the local tokenizer."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(_TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text, max_tokens, keep="head"):
+    """
+    Truncate text to at most max_tokens tokens.
+
+    Args:
+        text (str): The text to truncate
+        max_tokens (int): Token limit
+        keep (str): "head" keeps the beginning, "tail" keeps the end
+
+    Returns:
+        str: The truncated text
+    """
+    if max_tokens <= 0 or not text:
+        return ""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        kept = tokens[:max_tokens] if keep == "head" else tokens[-max_tokens:]
+        return _encoding.decode(kept)
+    matches = list(_TOKEN_PATTERN.finditer(text))
+    if len(matches) <= max_tokens:
+        return text
+    if keep == "head":
+        return text[:matches[max_tokens - 1].end()]
+    return text[matches[-max_tokens].start():]
+
+
+@dataclass
+class PromptSection:
+    """A named part of a prompt.
+
+    The header and footer are kept verbatim whenever the body survives
+    truncation; the body is cut from the end (keep="head") or from the
+    start (keep="tail", e.g. chat history).
+    """
+    name: str
+    body: str
+    priority: int = PRIORITY_REQUIRED
+    header: str = ""
+    footer: str = ""
+    keep: str = "head"
+    min_tokens: int = 0
+    role: str = "user"
+
+
+def _fit_sections(sections, budget, endpoint):
+    """Render each section within the budget; returns (rendered texts, report)."""
+    remaining = budget
+    rendered = [""] * len(sections)
+    report = {"endpoint": endpoint, "budget": budget, "sections": {}, "truncated": []}
+
+    order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, i))
+    for i in order:
+        section = sections[i]
+        if not section.body:
+            report["sections"][section.name] = 0
+            continue
+        frame_tokens = count_tokens(section.header) + count_tokens(section.footer)
+        body_tokens = count_tokens(section.body)
+        available = remaining - frame_tokens
+        if section.priority == PRIORITY_REQUIRED or body_tokens <= available:
+            body = section.body
+        elif available > max(section.min_tokens, 0):
+            body = truncate_to_tokens(section.body, available, keep=section.keep)
+            report["truncated"].append(section.name)
+        else:
+            body = ""
+            report["truncated"].append(section.name)
+        if body:
+            used = frame_tokens + count_tokens(body)
+            rendered[i] = f"{section.header}{body}{section.footer}"
+        else:
+            used = 0
+        remaining -= used
+        report["sections"][section.name] = used
+
+    report["total_tokens"] = sum(report["sections"].values())
+    logger.info(
+        f"Prompt tokens for {endpoint}: {report['total_tokens']}/{budget} "
+        f"{report['sections']} truncated={report['truncated']}"
+    )
+    return rendered, report
+
+
+def assemble_prompt(sections, budget, endpoint="prompt"):
+    """
+    Fit sections into a token budget and render them in order.
+
+    Args:
+        sections (list): PromptSection objects in render order
+        budget (int): Maximum input tokens for the prompt
+        endpoint (str): Name used when reporting token counts
+
+    Returns:
+        tuple: (prompt text, report dict with per-section and total token counts)
+    """
+    rendered, report = _fit_sections(sections, budget, endpoint)
+    return "".join(rendered), report
+
+
+def assemble_messages(sections, budget, endpoint="prompt"):
+    """
+    Fit sections into a token budget and render them as chat messages.
+
+    Consecutive sections with the same role are merged into one message, so
+    static system sections placed first form an identical prefix on every
+    request and can be reused by provider-side prompt caching.
+
+    Args:
+        sections (list): PromptSection objects in render order
+        budget (int): Maximum input tokens for the prompt
+        endpoint (str): Name used when reporting token counts
+
+    Returns:
+        tuple: (messages list, report dict with per-section and total token counts)
+    """
+    rendered, report = _fit_sections(sections, budget, endpoint)
+    messages = []
+    for section, text in zip(sections, rendered):
+        if not text:
+            continue
+        if messages and messages[-1]["role"] == section.role:
+            messages[-1]["content"] += text
+        else:
+            messages.append({"role": section.role, "content": text})
+    return messages, report
@@ -1,7 +1,12 @@
 import os
 import json
+import hashlib
 import logging
 from dotenv import load_dotenv
+from services.search_index import InvertedIndex
+from services.embeddings import EMBEDDING_DIM, EMBEDDING_VERSION, embed_text, embed_texts
+from services.vector_store import VectorStore
+from services.ann_index import IVFIndex
 import sys
 
 # Configure logging
@@ -13,6 +18,24 @@ load_dotenv()
 
 # Path for knowledge base
 KNOWLEDGE_BASE_PATH = os.getenv("KNOWLEDGE_BASE_PATH", "data/knowledge_base")
+# Passage vectors and the ANN index are derived from the knowledge base, so they
+# live in a cache directory rather than next to it in the source tree
+CACHE_DIR = os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", os.path.join(CACHE_DIR, "cigops", "knowledge_base_vectors"))
+
+# How passages are retrieved: "keyword" (BM25), "vector" (embeddings) or
+# "hybrid" (both, merged with reciprocal rank fusion)
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RRF_K = 60
+# Vector matches below this cosine similarity are dropped before fusion: hashed
+# n-gram collisions give unrelated passages small positive scores (about 0.02-0.12
+# for greetings and thanks), which would otherwise be fused into every prompt
+VECTOR_MIN_SIMILARITY = float(os.getenv("VECTOR_MIN_SIMILARITY", "0.15"))
+
+# Vector search switches from exact scoring to the approximate (IVF) index at
+# this many passages; ANN_NLIST=0 picks about sqrt(passages) clusters
+ANN_MIN_PASSAGES = int(os.getenv("ANN_MIN_PASSAGES", "50000"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
 
 # Add the parent directory to sys.path to find the virtual environment
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
@@ -27,12 +50,176 @@ def load_knowledge_base():
         logger.warning(f"Knowledge base file not found at {knowledge_base_path}")
         return []
 
-# Load the knowledge base once on startup
+def build_knowledge_index(entries):
+    """Build the inverted index over knowledge base contents; passage IDs are list positions."""
+    index = InvertedIndex()
+    for entry in entries:
+        index.add(entry.get("content", ""))
+    logger.info(f"Indexed knowledge base: {index.stats()}")
+    return index
+
+def passage_key(entry):
+    """Identify the text a stored vector was computed from."""
+    return hashlib.sha1(entry.get("content", "").encode("utf-8")).hexdigest()
+
+def build_vector_store(entries):
+    """
+    Load the persisted passage vectors and embed only the passages that are
+    new or changed since they were saved.
+    """
+    try:
+        store = VectorStore(VECTOR_STORE_PATH, EMBEDDING_DIM, EMBEDDING_VERSION)
+    except RuntimeError as e:
+        logger.warning(f"{e} Falling back to keyword retrieval.")
+        return None
+    store.load()
+    keys = [passage_key(entry) for entry in entries]
+    # Reuse the longest prefix of rows that still match the knowledge base
+    reusable = store.matching_prefix(keys)
+    if reusable == len(store) == len(keys):
+        logger.info(f"Loaded {len(store)} passage vectors from {VECTOR_STORE_PATH}")
+        return store
+    store.truncate(reusable)
+    store.add(keys[reusable:], embed_texts([entry.get("content", "") for entry in entries[reusable:]]))
+    try:
+        store.save()
+    except OSError as e:
+        logger.error(f"Error saving passage vectors: {e}")
+    logger.info(f"Embedded {len(keys) - reusable} passages ({reusable} reused) into {VECTOR_STORE_PATH}")
+    return store
+
+def keys_fingerprint(store, count):
+    """Identify the first count rows of the vector store."""
+    return hashlib.sha1(store.keys[:count].tobytes()).hexdigest()
+
+def sync_ann_index(index, store):
+    """
+    Bring the approximate index up to date with the vector store: load it
+    from disk, list only the rows added since it was saved, or rebuild it if
+    earlier rows changed.
+    
+    Returns:
+        IVFIndex: The index, or None while the store is small enough to search exactly
+    """
+    if store is None or len(store) < ANN_MIN_PASSAGES:
+        return None
+    if index is None:
+        index = IVFIndex(EMBEDDING_DIM)
+        index.load(VECTOR_STORE_PATH)
+    indexed = len(index)
+    if indexed and indexed <= len(store) and index.fingerprint == keys_fingerprint(store, indexed):
+        if indexed == len(store):
+            return index
+        index.add(store.vectors[indexed:])
+        logger.info(f"Added {len(store) - indexed} passages to the ANN index")
+    else:
+        index.build(store.vectors, ANN_NLIST or None)
+        logger.info(f"Built ANN index over {len(store)} passages with {index.nlist} lists")
+    index.fingerprint = keys_fingerprint(store, len(index))
+    try:
+        index.save(VECTOR_STORE_PATH)
+    except OSError as e:
+        logger.error(f"Error saving ANN index: {e}")
+    return index
+
+# Load and index the knowledge base once on startup; the vectors are loaded
+# (and embedded and saved if needed) on first use, not on import
 knowledge_base = load_knowledge_base()
+knowledge_index = build_knowledge_index(knowledge_base)
+vector_store = None
+ann_index = None
+_vectors_loaded = False
+
+def load_vectors():
+    """Load or build the passage vectors and ANN index once; returns the vector store (None without NumPy)."""
+    global vector_store, ann_index, _vectors_loaded
+    if not _vectors_loaded:
+        _vectors_loaded = True
+        vector_store = build_vector_store(knowledge_base)
+        ann_index = sync_ann_index(None, vector_store)
+    return vector_store
+
+def vector_search(query_vector, k):
+    """
+    (passage position, similarity) pairs with at least VECTOR_MIN_SIMILARITY:
+    approximate on large knowledge bases, exact otherwise.
+    """
+    if ann_index is not None:
+        ranking = ann_index.search(vector_store.vectors, query_vector, k)
+    else:
+        ranking = vector_store.search(query_vector, k)
+    return similar_enough(ranking)
+
+def similar_enough(ranking):
+    """Drop matches below VECTOR_MIN_SIMILARITY from a best-first ranking."""
+    return [(doc_id, score) for doc_id, score in ranking if score >= VECTOR_MIN_SIMILARITY]
+
+def search(query, k=3):
+    """
+    Retrieve passages by meaning: cosine similarity between the query and
+    passage embeddings.
+    
+    Args:
+        query (str): The user query
+        k (int): The number of passages to retrieve
+        
+    Returns:
+        list: Passages (id, text, source, score), most similar first; only
+              passages with at least VECTOR_MIN_SIMILARITY
+    """
+    return search_many([query], k)[0]
+
+def search_many(queries, k=3):
+    """
+    Vector search for several queries at once (one matrix-matrix product
+    while the knowledge base is searched exactly).
+    
+    Args:
+        queries (list): The user queries
+        k (int): The number of passages to retrieve per query
+        
+    Returns:
+        list: One list of passages per query (see search)
+    """
+    if load_vectors() is None:
+        return [[] for _ in queries]
+    if ann_index is not None:
+        rankings = [vector_search(embed_text(query), k) for query in queries]
+    else:
+        rankings = [similar_enough(ranking) for ranking in vector_store.search_batch(embed_texts(queries), k)]
+    results = []
+    for ranking in rankings:
+        passages = []
+        for doc_id, score in ranking:
+            entry = knowledge_base[doc_id]
+            passages.append({
+                "id": entry.get("id", str(doc_id)),
+                "text": entry.get("content", ""),
+                "source": entry.get("source", "Unknown"),
+                "score": score
+            })
+        results.append(passages)
+    return results
+
+def rank_passages(query, k):
+    """Passage positions for a query, best first, using RAG_RETRIEVAL_MODE."""
+    if RAG_RETRIEVAL_MODE == "keyword" or load_vectors() is None:
+        return [doc_id for doc_id, _ in knowledge_index.search(query, k)]
+    query_vector = embed_text(query)
+    if RAG_RETRIEVAL_MODE == "vector":
+        return [doc_id for doc_id, _ in vector_search(query_vector, k)]
+    # Hybrid: each ranking contributes 1 / (RRF_K + rank), so passages ranked
+    # well by both come first, and a passage found by only one still counts
+    fused = {}
+    for ranking in (knowledge_index.search(query, k * 4), vector_search(query_vector, k * 4)):
+        for rank, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)[:k]
 
 def retrieve_relevant_passages(query, k=3):
     """
-    Retrieve relevant passages from the knowledge base using keyword matching.
+    Retrieve relevant passages from the knowledge base by keyword (BM25),
+    by meaning (embeddings) or both, depending on RAG_RETRIEVAL_MODE.
     
     Args:
         query (str): The user query
@@ -42,31 +229,13 @@ def retrieve_relevant_passages(query, k=3):
         list: A list of relevant passages
     """
     try:
-        query_lower = query.lower()
         relevant_passages = []
         
-        # Simple keyword matching: find passages that contain words from the query
-        query_words = set(query_lower.split())
-        
-        # Sort passages by the number of matching keywords in descending order
-        scored_passages = []
-        for entry in knowledge_base:
-            content = entry.get("content", "").lower()
-            source = entry.get("source", "Unknown")
-            # Count matching keywords, excluding common words
-            matching_keywords = query_words.intersection(set(content.split()))
-            score = len(matching_keywords)
-            if score > 0:
-                scored_passages.append({"text": entry.get("content", ""), "source": source, "score": score})
-                
-        # Sort by score and take the top k
-        scored_passages.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Format the results
-        for passage in scored_passages[:k]:
+        for doc_id in rank_passages(query, k):
+            entry = knowledge_base[doc_id]
             relevant_passages.append({
-                "text": passage["text"],
-                "source": passage["source"]
+                "text": entry.get("content", ""),
+                "source": entry.get("source", "Unknown")
             })
         
         return relevant_passages
@@ -74,6 +243,58 @@ def retrieve_relevant_passages(query, k=3):
         logger.error(f"Error retrieving passages: {e}")
         return []
 
+def add_documents(docs):
+    """
+    Add documents to the knowledge base: index them for keyword search,
+    embed them in batches, persist the vectors and save the JSON file once.
+    
+    Args:
+        docs (list): Dicts with 'id', 'text' (or 'content') and 'source';
+                     documents whose id is already present are skipped
+        
+    Returns:
+        int: The number of documents added
+    """
+    global ann_index
+    load_vectors()
+    
+    existing_ids = {entry["id"] for entry in knowledge_base if "id" in entry}
+    new_entries = []
+    for doc in docs:
+        doc_id = doc.get("id")
+        if doc_id is not None and doc_id in existing_ids:
+            logger.info(f"Skipping document {doc_id}: already in the knowledge base")
+            continue
+        entry = {key: value for key, value in doc.items() if key != "text"}
+        entry["content"] = doc.get("text", doc.get("content", ""))
+        entry.setdefault("source", "Unknown")
+        new_entries.append(entry)
+        if doc_id is not None:
+            existing_ids.add(doc_id)
+    if not new_entries:
+        return 0
+    
+    # Create knowledge base directory if it doesn't exist
+    os.makedirs(KNOWLEDGE_BASE_PATH, exist_ok=True)
+    
+    # Add the entries to the in-memory knowledge base, its index and the vector store
+    vectors = embed_texts([entry["content"] for entry in new_entries]) if vector_store is not None else None
+    knowledge_base.extend(new_entries)
+    for entry in new_entries:
+        knowledge_index.add(entry["content"])
+    if vector_store is not None:
+        vector_store.add([passage_key(entry) for entry in new_entries], vectors)
+        vector_store.save()
+        ann_index = sync_ann_index(ann_index, vector_store)
+    
+    # Save the updated knowledge base to the JSON file
+    knowledge_base_path = f"{KNOWLEDGE_BASE_PATH}/knowledge_base.json"
+    with open(knowledge_base_path, "w") as f:
+        json.dump(knowledge_base, f, indent=2)
+    
+    logger.info(f"Added {len(new_entries)} documents to knowledge base")
+    return len(new_entries)
+
 def update_knowledge_base_file(new_entry):
     """
     Add a new entry to the local knowledge base JSON file.
@@ -85,20 +306,7 @@ def update_knowledge_base_file(new_entry):
         bool: True if the update was successful, False otherwise
     """
     try:
-        global knowledge_base
-        
-        # Create knowledge base directory if it doesn't exist
-        os.makedirs(KNOWLEDGE_BASE_PATH, exist_ok=True)
-        
-        # Add new entry to the in-memory knowledge base
-        knowledge_base.append(new_entry)
-        
-        # Save the updated knowledge base to the JSON file
-        knowledge_base_path = f"{KNOWLEDGE_BASE_PATH}/knowledge_base.json"
-        with open(knowledge_base_path, "w") as f:
-            json.dump(knowledge_base, f, indent=2)
-        
-        logger.info(f"Added new entry to knowledge base file")
+        add_documents([new_entry])
         return True
     except Exception as e:
         logger.error(f"Error updating knowledge base file: {e}")
@@ -1,73 +1,89 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import JSONResponse
-from typing import List
-import io
-
-# Import libraries for document parsing (install these: pip install PyMuPDF python-docx)
-try:
-    import fitz # PyMuPDF
-except ImportError:
-    fitz = None
-try:
-    import docx # python-docx
-except ImportError:
-    docx = None
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Optional
 
 # Import the document analysis function from the document analyzer service
-from services.document_analyzer_service import analyze_document_with_watsonx
+from services.document_analyzer_service import analyze_chunks_with_status, stream_chunks_analysis, chunk_pages, ANALYSIS_VERSION
+from services.analysis_cache import analysis_cache, make_digest_key
+from services.document_sessions import document_sessions, search_chunks, build_chunks_from_pages
+from services.document_extraction import (
+    iter_pages, spool_upload, expand_zip, SpooledUpload, DocumentExtractionError,
+    DOCUMENT_EXTRACTION_WORKERS, DOCUMENT_BULK_MAX_FILES
+)
+from services.prompt_budget import count_tokens, PROMPT_BUDGETS
+from routes.chat import format_sse
+from pydantic import BaseModel
+import os
+import json
+import time
+import asyncio
+import logging
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Documents of one bulk request analyzed by the model at the same time
+BULK_ANALYSIS_CONCURRENCY = int(os.getenv("BULK_ANALYSIS_CONCURRENCY", "4"))
 
 async def parse_document_content(document: UploadFile) -> str:
-    """Reads and extracts text content from uploaded document files."""
-    content = await document.read()
-    file_extension = document.filename.split('.')[-1].lower()
-    text_content = ""
-
-    if file_extension == 'pdf':
-        if not fitz:
-            raise HTTPException(status_code=500, detail="PyMuPDF not installed. Cannot process PDF files.")
-        try:
-            pdf_document = fitz.open(stream=content, filetype="pdf")
-            for page_num in range(pdf_document.page_count):
-                page = pdf_document.load_page(page_num)
-                text_content += page.get_text()
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error parsing PDF: {e}")
-        finally:
-            if 'pdf_document' in locals() and pdf_document:
-                pdf_document.close()
+    """Reads and extracts text content from uploaded document files, up to the document chat budget."""
+    with await spool_document(document) as upload:
+        return await extract_document_text(upload, max_tokens=PROMPT_BUDGETS["document_chat"])
 
-    elif file_extension in ['doc', 'docx']:
-        if not docx:
-             raise HTTPException(status_code=500, detail="python-docx not installed. Cannot process DOC/DOCX files.")
-        try:
-            # python-docx requires a file path or a file-like object that is seekable
-            # We can use io.BytesIO to create a file-like object from bytes
-            doc_obj = docx.Document(io.BytesIO(content))
-            for paragraph in doc_obj.paragraphs:
-                text_content += paragraph.text + "\n"
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error parsing DOC/DOCX: {e}")
-
-    elif file_extension == 'txt':
-        try:
-            text_content = content.decode('utf-8') # Basic decoding
-        except Exception as e:
-             raise HTTPException(status_code=500, detail=f"Error decoding TXT: {e}")
-             
-    else:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
+async def spool_document(document: UploadFile) -> SpooledUpload:
+    """Streams an upload to a temporary file, enforcing the upload size limit."""
+    try:
+        return await spool_upload(document)
+    except DocumentExtractionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+async def extract_document_text(upload: SpooledUpload, max_tokens: int = None) -> str:
+    """
+    Extracts text content from a spooled upload off the event loop.
+    With max_tokens, extraction stops after the page that reaches that many tokens.
+    """
+    pages = []
+    tokens = 0
+    page_iterator = iter_pages(upload.path, upload.filename)
+    try:
+        async for page in page_iterator:
+            pages.append(page)
+            tokens += count_tokens(page)
+            if max_tokens is not None and tokens >= max_tokens:
+                break
+    except DocumentExtractionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        # Cancels the extraction of the remaining pages
+        await page_iterator.aclose()
+    return "".join(pages)
 
-    return text_content
+async def extract_document_chunks(upload: SpooledUpload) -> List[str]:
+    """Extracts a spooled upload page by page straight into analysis chunks, without joining the pages."""
+    try:
+        return [chunk async for chunk in chunk_pages(iter_pages(upload.path, upload.filename))]
+    except DocumentExtractionError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
 
 
 @router.post("/api/analyze-document")
 async def analyze_document(document: UploadFile = File(...)):
-    text_content = await parse_document_content(document)
+    with await spool_document(document) as upload:
+        # Identical uploads are answered from the content-addressed cache,
+        # without parsing the file or calling the model
+        cache_key = make_digest_key(upload.sha256, ANALYSIS_VERSION)
+        cached_result = analysis_cache.get(cache_key)
+        if cached_result is not None:
+            logger.info(f"Analysis cache hit for {document.filename}")
+            return JSONResponse(content=cached_result)
+
+        chunks = await extract_document_chunks(upload)
     
     # Use the function from the new document analyzer service
-    analysis_result = await analyze_document_with_watsonx(text_content)
+    analysis_result, complete = await analyze_chunks_with_status(chunks)
+    if complete:
+        analysis_cache.set(cache_key, analysis_result)
 
     return JSONResponse(content=analysis_result)
 
@@ -84,4 +100,198 @@ async def chat_document(document: UploadFile = File(...), question: str = Form(.
     chat_response = await groq_service.chat_with_document_groq(text_content, question, chat_history, analysis_context=analysis_context)
 
     # The chat_with_document_groq function returns a string, so wrap it in a dict
-    return JSONResponse(content={"response": chat_response}) 
\ No newline at end of file
+    return JSONResponse(content={"response": chat_response})
+
+@router.post("/api/analyze-document/stream")
+async def analyze_document_stream(document: UploadFile = File(...)):
+    """
+    Analyze a document and stream the result as Server-Sent Events.
+    Emits `meta`, then a `summary` event per analyzed chunk and an `item` event
+    for each new value, keyword or point as soon as the model has written it,
+    and finally `done` with the full result in the /api/analyze-document schema.
+    """
+    with await spool_document(document) as upload:
+        cache_key = make_digest_key(upload.sha256, ANALYSIS_VERSION)
+        cached_result = analysis_cache.get(cache_key)
+        chunks = None if cached_result is not None else await extract_document_chunks(upload)
+
+    async def event_stream():
+        if cached_result is not None:
+            logger.info(f"Analysis cache hit for {document.filename}")
+            yield format_sse("meta", {"chunks": 1, "cached": True})
+            yield format_sse("summary", {"text": cached_result.get("summary", ""), "part": 0})
+            for key in ["importantValues", "keywords", "highlightedPoints"]:
+                for value in cached_result.get(key) or []:
+                    yield format_sse("item", {"key": key, "value": value})
+            yield format_sse("done", {"result": cached_result, "complete": True})
+            return
+
+        async for event, data in stream_chunks_analysis(chunks):
+            if event == "meta":
+                data["cached"] = False
+            elif event == "done" and data["complete"]:
+                analysis_cache.set(cache_key, data["result"])
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def analyze_spooled_document(index: int, filename: str, upload: SpooledUpload, extract_slots: asyncio.Semaphore, analysis_slots: asyncio.Semaphore):
+    """Analyze one document of a bulk request; returns its NDJSON result line."""
+    line = {"index": index, "filename": filename}
+    cache_key = make_digest_key(upload.sha256, ANALYSIS_VERSION)
+    cached_result = analysis_cache.get(cache_key)
+    if cached_result is not None:
+        return {**line, "cached": True, "result": cached_result}
+    try:
+        async with extract_slots:
+            chunks = [chunk async for chunk in chunk_pages(iter_pages(upload.path, upload.filename))]
+    except DocumentExtractionError as e:
+        return {**line, "error": str(e)}
+    finally:
+        upload.close()
+    async with analysis_slots:
+        analysis_result, complete = await analyze_chunks_with_status(chunks)
+    if complete:
+        analysis_cache.set(cache_key, analysis_result)
+    return {**line, "cached": False, "complete": complete, "result": analysis_result}
+
+@router.post("/api/analyze-documents")
+async def analyze_documents(documents: List[UploadFile] = File(...)):
+    """
+    Analyze several documents in one request, given as multiple files and/or zip archives.
+    Results are streamed as NDJSON as each document finishes (each line carries its
+    `index` and `filename`, and `result` in the /api/analyze-document schema or an
+    `error`), followed by a summary line with `"done": true` whose `failed` count
+    includes documents with an error or an incomplete (`"complete": false`) analysis.
+    """
+    entries = []
+    try:
+        for document in documents:
+            upload = await spool_document(document)
+            if document.filename.lower().endswith(".zip"):
+                try:
+                    entries.extend(await asyncio.to_thread(expand_zip, upload.path))
+                except DocumentExtractionError as e:
+                    raise HTTPException(status_code=e.status_code, detail=f"{document.filename}: {e}")
+                finally:
+                    upload.close()
+            else:
+                entries.append((document.filename, upload, None))
+            if len(entries) > DOCUMENT_BULK_MAX_FILES:
+                raise HTTPException(status_code=413, detail=f"At most {DOCUMENT_BULK_MAX_FILES} documents per request")
+    except BaseException:
+        for _, upload, _ in entries:
+            if upload:
+                upload.close()
+        raise
+
+    def cleanup():
+        for _, upload, _ in entries:
+            if upload:
+                upload.close()
+
+    async def result_stream():
+        started = time.perf_counter()
+        extract_slots = asyncio.Semaphore(DOCUMENT_EXTRACTION_WORKERS)
+        analysis_slots = asyncio.Semaphore(BULK_ANALYSIS_CONCURRENCY)
+        running = set()
+        completed = failed = 0
+        try:
+            for index, (filename, upload, error) in enumerate(entries):
+                if error:
+                    completed += 1
+                    failed += 1
+                    yield json.dumps({"index": index, "filename": filename, "error": error}) + "\n"
+                    continue
+                running.add(asyncio.ensure_future(
+                    analyze_spooled_document(index, filename, upload, extract_slots, analysis_slots)
+                ))
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    line = task.result()
+                    completed += 1
+                    # Incomplete or fallback analyses did not succeed either
+                    failed += "error" in line or line.get("complete") is False
+                    yield json.dumps(line) + "\n"
+        finally:
+            for task in running:
+                task.cancel()
+            cleanup()
+
+        total_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Bulk analysis finished {completed} documents ({failed} failed) in {total_ms} ms")
+        yield json.dumps({"done": True, "completed": completed, "failed": failed, "total_ms": total_ms}) + "\n"
+
+    # The background task removes spooled files even if the stream never starts
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson", background=BackgroundTask(cleanup))
+
+class DocumentQuestion(BaseModel):
+    question: str
+    analysis_context: Optional[str] = None
+
+@router.post("/api/documents")
+async def create_document_session(document: UploadFile = File(...), analysis_context: str = Form("")):
+    """
+    Upload a document once for follow-up questions.
+    Returns a document_id to use with /api/documents/{document_id}/chat.
+    """
+    with await spool_document(document) as upload:
+        try:
+            chunks, page_count = await build_chunks_from_pages(iter_pages(upload.path, upload.filename))
+        except DocumentExtractionError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+    session = document_sessions.create(document.filename, chunks, page_count, analysis_context)
+    return {
+        "document_id": session["document_id"],
+        "filename": session["filename"],
+        "pages": session["page_count"],
+        "chunks": len(session["chunks"])
+    }
+
+@router.post("/api/documents/{document_id}/chat")
+async def chat_document_session(document_id: str, body: DocumentQuestion):
+    """
+    Ask a question about an uploaded document.
+    Only the chunks most relevant to the question and the stored history are sent to the model.
+    """
+    # Questions about one session run one at a time, each seeing the previous answers
+    async with document_sessions.lock(document_id):
+        session = document_sessions.get(document_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Document session not found")
+
+        relevant_chunks = search_chunks(session, body.question)
+        document_text = "\n\n".join(f"[Page {chunk['page']}]\n{chunk['text']}" for chunk in relevant_chunks)
+        analysis_context = body.analysis_context if body.analysis_context is not None else session["analysis_context"]
+
+        from services import groq_service
+        chat_response = await groq_service.chat_with_document_groq(
+            document_text, body.question, session["history"], analysis_context=analysis_context
+        )
+        document_sessions.append_exchange(session, body.question, chat_response)
+
+    return {"response": chat_response, "pages": sorted({chunk["page"] for chunk in relevant_chunks})}
+
+@router.get("/api/documents/{document_id}")
+async def get_document_session(document_id: str):
+    session = document_sessions.get(document_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Document session not found")
+    return {
+        "document_id": session["document_id"],
+        "filename": session["filename"],
+        "created_at": session["created_at"],
+        "pages": session["page_count"],
+        "history": session["history"]
+    }
+
+@router.delete("/api/documents/{document_id}")
+async def delete_document_session(document_id: str):
+    if not document_sessions.delete(document_id):
+        raise HTTPException(status_code=404, detail="Document session not found")
+    return {"deleted": document_id}
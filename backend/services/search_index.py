@@ -0,0 +1,204 @@
+"""
+In-memory inverted index with BM25 ranking for knowledge-base retrieval.
+
+Each term maps to a posting list of passage IDs with term frequencies, built
+once when the knowledge base loads and appended to as passages are added.
+Text is analyzed the same way at index and query time: a compiled regex
+tokenizer, a stopword list and a light suffix-stripping stemmer. Passage
+lengths are stored at index time and IDF and length normalization are
+precomputed, so a query only walks the postings of its own terms, highest
+IDF first, and stops opening new postings once the remaining terms can no
+longer change the top k.
+"""
+
+import re
+import math
+import heapq
+import logging
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a about above after again against all am an and any are as at be because been before being below
+    between both but by can could d did do does doing don down during each few for from further had has
+    have having he her here hers herself him himself his how i if in into is it its itself just ll m me
+    more most my myself no nor not now of off on once only or other our ours ourselves out over own re
+    s same she should so some such t than that the their theirs them themselves then there these they
+    this those through to too under until up ve very was we were what when where which while who whom
+    why will with would you your yours yourself yourselves
+""".split())
+
+# Longest matching suffix wins; the stem must keep at least 3 characters
+_SUFFIXES = (
+    ("ational", "ate"), ("fulness", "ful"), ("iveness", "ive"), ("ization", "ize"),
+    ("ements", "ement"), ("ments", "ment"), ("ness", ""), ("ings", ""), ("ies", "y"),
+    ("ing", ""), ("ied", "y"), ("ers", "er"), ("edly", ""), ("ed", ""), ("ly", ""),
+    ("es", ""), ("s", ""),
+)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """
+    Strip common English inflections so that e.g. "cravings", "craving" and
+    "craved" share the stem "crav". Not a full Porter stemmer.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _SUFFIXES:
+        if word.endswith(suffix):
+            if suffix == "s" and word.endswith("ss"):
+                return word
+            stemmed = word[:-len(suffix)] + replacement
+            if suffix == "es" and not stemmed.endswith(("ss", "x", "z", "ch", "sh")):
+                # "smokes" -> "smoke", but "boxes" -> "box"
+                stemmed = word[:-1]
+            if len(stemmed) < 3:
+                return word
+            # "stopped" -> "stop", "running" -> "run"
+            if suffix in ("ing", "ings", "ed", "edly") and len(stemmed) > 3 and stemmed[-1] == stemmed[-2] and stemmed[-1] not in "lsz":
+                stemmed = stemmed[:-1]
+            # "smoke" and "smoking" both become "smok"
+            if stemmed.endswith("e") and len(stemmed) > 3:
+                stemmed = stemmed[:-1]
+            return stemmed
+    if word.endswith("e"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords."""
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def analyze(text):
+    """Tokenize, drop stopwords and stem; used for both passages and queries."""
+    return [stem(t) for t in tokenize(text)]
+
+
+class InvertedIndex:
+    """Term -> posting list (passage IDs and term frequencies), ranked with BM25."""
+
+    def __init__(self, analyzer=analyze, k1=BM25_K1, b=BM25_B):
+        self.analyzer = analyzer
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> (array of passage IDs, array of term frequencies)
+        self.doc_lengths = array("I")
+        self.total_length = 0
+        self._idf = {}
+        self._norms = None
+
+    @property
+    def doc_count(self):
+        return len(self.doc_lengths)
+
+    def add(self, text):
+        """
+        Index a passage.
+
+        Returns:
+            int: The passage ID (its position in insertion order)
+        """
+        doc_id = self.doc_count
+        terms = self.analyzer(text or "")
+        for term, tf in Counter(terms).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("I"))
+            posting[0].append(doc_id)
+            posting[1].append(tf)
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+        # Collection statistics changed; recompute them on the next search
+        self._idf = {}
+        self._norms = None
+        return doc_id
+
+    def _prepare(self):
+        """Precompute the BM25 length normalization of every passage."""
+        if self._norms is None:
+            average = self.total_length / self.doc_count if self.doc_count else 0.0
+            k1, b = self.k1, self.b
+            self._norms = array("d", (
+                k1 * (1 - b + b * length / average) if average else k1 for length in self.doc_lengths
+            ))
+
+    def idf(self, term):
+        """BM25 inverse document frequency (always positive)."""
+        value = self._idf.get(term)
+        if value is None:
+            df = len(self.postings[term][0]) if term in self.postings else 0
+            value = self._idf[term] = math.log(1 + (self.doc_count - df + 0.5) / (df + 0.5))
+        return value
+
+    def search(self, query, k=3):
+        """
+        Rank passages against a query with BM25.
+
+        Ties keep insertion order, matching a stable sort over the passages.
+
+        Returns:
+            list: (passage ID, score) tuples, best first, only passages sharing a term with the query
+        """
+        terms = [t for t in set(self.analyzer(query or "")) if t in self.postings]
+        if not terms or k <= 0:
+            return []
+        self._prepare()
+        norms = self._norms
+        k1_plus_1 = self.k1 + 1
+        terms.sort(key=self.idf, reverse=True)
+        # A term adds at most idf * (k1 + 1) to any passage's score
+        bounds = [self.idf(t) * k1_plus_1 for t in terms]
+        remaining = sum(bounds)
+
+        scores = {}
+        for i, term in enumerate(terms):
+            if len(scores) >= k and remaining < heapq.nlargest(k, scores.values())[-1]:
+                # A passage not seen yet scores at most `remaining` and cannot enter
+                # the top k, so only finish scoring the passages already found
+                self._rescore(scores, terms[i:])
+                break
+            weight = self.idf(term) * k1_plus_1
+            ids, tfs = self.postings[term]
+            get = scores.get
+            for doc_id, tf in zip(ids, tfs):
+                scores[doc_id] = get(doc_id, 0.0) + weight * tf / (tf + norms[doc_id])
+            remaining -= bounds[i]
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def _rescore(self, scores, terms):
+        """Add the contribution of terms to passages already scored."""
+        norms = self._norms
+        k1_plus_1 = self.k1 + 1
+        candidates = sorted(scores)
+        for term in terms:
+            weight = self.idf(term) * k1_plus_1
+            ids, tfs = self.postings[term]
+            # Both lists are sorted, so each lookup resumes where the last one ended
+            i = 0
+            size = len(ids)
+            for doc_id in candidates:
+                i = bisect_left(ids, doc_id, i)
+                if i == size:
+                    break
+                if ids[i] == doc_id:
+                    tf = tfs[i]
+                    scores[doc_id] += weight * tf / (tf + norms[doc_id])
+
+    def stats(self):
+        return {
+            "passages": self.doc_count,
+            "terms": len(self.postings),
+            "postings": sum(len(ids) for ids, _ in self.postings.values()),
+            "average_length": round(self.total_length / self.doc_count, 2) if self.doc_count else 0.0,
+        }
@@ -0,0 +1,177 @@
+"""
+Keyword signal detection for user messages.
+
+All keyword tables (craving, craving intensity, emotion, conversation topic
+and crisis) are compiled once into a single Aho-Corasick automaton, so one
+pass over a message finds every signal no matter how many keywords there
+are. Matching is case-insensitive substring matching, the same semantics as
+the `keyword in message.lower()` checks it replaces.
+"""
+
+import logging
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Core craving phrases
+CRAVING_KEYWORDS = ("craving", "urge", "want to smoke", "need a cigarette", "temptation")
+
+# Broader craving phrases used to prioritize craving conversations
+CRAVING_EXTENDED_KEYWORDS = CRAVING_KEYWORDS + (
+    "desire", "nicotine hit", "can't resist", "really want to smoke", "smoke so bad", "need to vape", "need to smoke"
+)
+
+# Intensity hints; when several levels match the last level listed wins
+INTENSITY_KEYWORDS = {
+    "high": ["really", "very", "extremely", "intense", "strong", "powerful", "overwhelming"],
+    "medium": ["somewhat", "moderate", "fairly", "quite"],
+    "low": ["slight", "mild", "little", "bit"]
+}
+INTENSITY_SCORES = {"high": 8, "medium": 5, "low": 3}
+
+# Emotions; when several match the first one listed wins
+EMOTION_KEYWORDS = {
+    "happy": ["happy", "joy", "excited", "great", "wonderful", "fantastic", "amazing"],
+    "sad": ["sad", "depressed", "down", "unhappy", "miserable", "terrible", "awful"],
+    "angry": ["angry", "mad", "furious", "annoyed", "irritated", "frustrated"],
+    "anxious": ["anxious", "nervous", "worried", "stressed", "overwhelmed", "panicked"],
+    "calm": ["calm", "relaxed", "peaceful", "serene", "tranquil", "content"]
+}
+
+# Conversation topics used to pick follow-up questions, in priority order
+TOPIC_KEYWORDS = {
+    "craving": CRAVING_KEYWORDS,
+    "stress": ["stress", "anxious", "worried", "nervous", "overwhelmed"],
+    "motivation": ["motivation", "motivated", "inspired", "encouraged", "determined"],
+    "relapse": ["relapse", "slipped", "failed", "gave in", "smoked"]
+}
+
+CRISIS_KEYWORDS = ("hopeless", "suicidal", "give up", "end it", "can't go on", "kill myself", "emergency")
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton mapping keywords to payloads."""
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (dict): keyword -> iterable of payloads reported when it occurs
+        """
+        self._goto = [{}]
+        outputs = [set()]
+        for keyword, payloads in keywords.items():
+            state = 0
+            for char in keyword.lower():
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    outputs.append(set())
+                state = next_state
+            outputs[state].update(payloads)
+
+        # Breadth-first pass: failure links, with each state's outputs merged
+        # with those of its failure state
+        fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                outputs[next_state] |= outputs[fail[next_state]]
+        self._fail = fail
+        self._outputs = [frozenset(o) for o in outputs]
+        self.size = len(keywords)
+
+    def match(self, text):
+        """Return the set of payloads of every keyword occurring in text."""
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        state = 0
+        found = set()
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+
+@dataclass(frozen=True)
+class MessageSignals:
+    """Every keyword signal detected in one message."""
+    craving: bool
+    craving_extended: bool
+    intensity: str
+    emotion: str
+    topics: tuple
+    crisis: bool
+
+    @property
+    def craving_intensity(self):
+        """Craving intensity on a 1-10 scale (5 without hints), or None without a craving."""
+        if not self.craving:
+            return None
+        return INTENSITY_SCORES.get(self.intensity, 5)
+
+
+def build_matcher():
+    """Compile all keyword tables into one matcher."""
+    keywords = {}
+
+    def add(words, payload):
+        for word in words:
+            keywords.setdefault(word, set()).add(payload)
+
+    add(CRAVING_KEYWORDS, ("craving", None))
+    add(CRAVING_EXTENDED_KEYWORDS, ("craving_extended", None))
+    for level, words in INTENSITY_KEYWORDS.items():
+        add(words, ("intensity", level))
+    for emotion, words in EMOTION_KEYWORDS.items():
+        add(words, ("emotion", emotion))
+    for topic, words in TOPIC_KEYWORDS.items():
+        add(words, ("topic", topic))
+    add(CRISIS_KEYWORDS, ("crisis", None))
+    return KeywordMatcher(keywords)
+
+
+# Compiled once at import
+signal_matcher = build_matcher()
+
+
+@lru_cache(maxsize=1024)
+def detect_signals(message):
+    """
+    Detect craving, intensity, emotion, topic and crisis signals in one pass.
+
+    Args:
+        message (str): The user message
+
+    Returns:
+        MessageSignals: The detected signals
+    """
+    found = signal_matcher.match(message or "")
+    kinds = {kind for kind, _ in found}
+    intensity = None
+    for level in INTENSITY_KEYWORDS:
+        if ("intensity", level) in found:
+            intensity = level
+    emotion = next((e for e in EMOTION_KEYWORDS if ("emotion", e) in found), None)
+    return MessageSignals(
+        craving="craving" in kinds,
+        craving_extended="craving_extended" in kinds,
+        intensity=intensity,
+        emotion=emotion,
+        topics=tuple(t for t in TOPIC_KEYWORDS if ("topic", t) in found),
+        crisis="crisis" in kinds,
+    )
@@ -0,0 +1,160 @@
+"""
+On-disk store of knowledge-base passage embeddings.
+
+Vectors are one contiguous float32 matrix (row i is passage i) saved as
+`vectors.npy` and memory-mapped read-only when loaded, so every worker
+process serves queries from the same page-cache copy and nothing is parsed
+at startup. An ID sidecar, `vectors.ids.npy`, holds one fixed-width key per
+row (a hash of the passage text) so passages that are unchanged since the
+last run are not embedded again, and `vectors.json` records the embedding
+version and dimensions.
+
+A query is one matrix-vector product plus argpartition for the top k; a
+batch of queries is one matrix-matrix product.
+"""
+
+import os
+import json
+import logging
+from services.atomic_files import write_atomic
+
+# NumPy is required for vector search (install it: pip install numpy)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 40  # hex SHA-1
+
+
+class VectorStore:
+    """Float32 embedding rows with string keys, persisted in a directory."""
+
+    def __init__(self, directory, dim, version):
+        if np is None:
+            raise RuntimeError("NumPy not installed. Cannot build the vector store.")
+        self.directory = directory
+        self.dim = dim
+        self.version = version
+        self.keys = np.empty(0, dtype=f"S{KEY_BYTES}")
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    @property
+    def vectors_path(self):
+        return os.path.join(self.directory, "vectors.npy")
+
+    @property
+    def ids_path(self):
+        return os.path.join(self.directory, "vectors.ids.npy")
+
+    @property
+    def sidecar_path(self):
+        return os.path.join(self.directory, "vectors.json")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def load(self):
+        """
+        Memory-map the persisted vectors, unless they were built by another embedding version.
+
+        Returns:
+            bool: True if vectors were loaded
+        """
+        try:
+            with open(self.sidecar_path, "r", encoding="utf-8") as f:
+                sidecar = json.load(f)
+            if sidecar.get("version") != self.version or sidecar.get("dim") != self.dim:
+                logger.info(f"Ignoring vectors built by embedding version {sidecar.get('version')}")
+                return False
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+            keys = np.load(self.ids_path, mmap_mode="r")
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable vector store in {self.directory}: {e}")
+            return False
+        if vectors.dtype != np.float32 or vectors.ndim != 2 or vectors.shape != (len(keys), self.dim):
+            logger.warning(f"Discarding vector store in {self.directory}: {len(keys)} keys for a {vectors.shape} {vectors.dtype} matrix")
+            return False
+        self.keys = keys
+        self.vectors = vectors
+        return True
+
+    def save(self):
+        """
+        Write the matrix, the ID sidecar and the metadata atomically, then
+        memory-map the saved files in place of the in-memory copy.
+        """
+        write_atomic(self.vectors_path, lambda f: np.save(f, np.ascontiguousarray(self.vectors, dtype=np.float32)), "wb")
+        write_atomic(self.ids_path, lambda f: np.save(f, np.asarray(self.keys, dtype=f"S{KEY_BYTES}")), "wb")
+        sidecar = {"version": self.version, "dim": self.dim, "count": len(self.keys)}
+        write_atomic(self.sidecar_path, lambda f: json.dump(sidecar, f))
+        self.load()
+
+    def matching_prefix(self, keys):
+        """Number of leading rows whose keys equal keys (rows that can be reused)."""
+        count = min(len(self.keys), len(keys))
+        if not count:
+            return 0
+        mismatched = np.flatnonzero(self.keys[:count] != np.asarray(keys[:count], dtype=f"S{KEY_BYTES}"))
+        return int(mismatched[0]) if len(mismatched) else count
+
+    def add(self, keys, vectors):
+        """
+        Append rows (in memory until save()).
+
+        Args:
+            keys (list): One key per row
+            vectors (ndarray): len(keys) x dim float32 matrix
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(keys):
+            raise ValueError(f"Expected {len(keys)} rows, got {len(vectors)}")
+        self.keys = np.concatenate([self.keys, np.asarray(keys, dtype=f"S{KEY_BYTES}")])
+        self.vectors = np.concatenate([self.vectors, vectors])
+
+    def truncate(self, count):
+        """Drop every row from position count on."""
+        self.keys = self.keys[:count]
+        self.vectors = self.vectors[:count]
+
+    def search(self, query, k=3):
+        """
+        Rank rows by dot product (cosine similarity for normalized vectors).
+
+        Args:
+            query (ndarray): Query vector of length dim
+            k (int): Number of rows to return
+
+        Returns:
+            list: (row, score) tuples, best first, only rows with score > 0
+        """
+        return self.search_batch(np.asarray(query, dtype=np.float32).reshape(1, self.dim), k)[0]
+
+    def search_batch(self, queries, k=3):
+        """
+        Rank rows for several queries with one matrix-matrix product.
+
+        Args:
+            queries (ndarray): m x dim matrix, one query per row
+            k (int): Number of rows to return per query
+
+        Returns:
+            list: One list of (row, score) tuples per query (see search)
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if k <= 0 or not len(self.vectors):
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.vectors.T
+        k = min(k, scores.shape[1])
+        # argpartition finds the k best of each row in linear time; only those k are sorted
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, rows in zip(scores, top):
+            top_scores = row_scores[rows]
+            order = np.lexsort((rows, -top_scores))
+            results.append([(int(rows[i]), float(top_scores[i])) for i in order if top_scores[i] > 0])
+        return results
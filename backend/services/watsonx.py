@@ -4,8 +4,9 @@ import json
 import re
 import random
 from dotenv import load_dotenv
-from groq import Groq
+from services import llm_client
 from services.rag import retrieve_relevant_passages
+from services.signals import detect_signals, CRAVING_EXTENDED_KEYWORDS
 from services.craving import log_craving, get_craving_stats
 from datetime import datetime
 import requests
@@ -109,26 +110,11 @@ COPING_STRATEGIES = [
     "Call or text a friend for support right now."
 ]
 
-CRISIS_KEYWORDS = ["hopeless", "suicidal", "give up", "end it", "can't go on", "kill myself", "emergency"]
 CRISIS_RESPONSE = "It sounds like you're going through a really tough time. If you're in crisis or need immediate help, please call the National Suicide Prevention Lifeline at 1-800-273-8255 or your local emergency number. You are not alone."
 MEDICAL_DISCLAIMER = "(Disclaimer: I am not a substitute for professional medical advice. For medical decisions, please consult a healthcare provider.)"
 
-# Initialize the Groq client
-try:
-    if GROQ_API_KEY:
-        client = Groq(
-            api_key=GROQ_API_KEY,
-        )
-        MODEL_OK = True
-        logger.info(f"Successfully initialized Groq client with model: {GROQ_MODEL}")
-    else:
-        logger.error("GROQ_API_KEY not found in environment variables")
-        client = None
-        MODEL_OK = False
-except Exception as e:
-    logger.error(f"Groq client initialization failed: {e}")
-    client = None
-    MODEL_OK = False
+# The async Groq client is shared across services (see services/llm_client.py)
+MODEL_OK = llm_client.MODEL_OK
 
 def search_knowledge_base(query, knowledge_base):
     """
@@ -166,14 +152,10 @@ def search_knowledge_base(query, knowledge_base):
     return knowledge_base[best_match_index]
 
 def craving_keywords():
-    return [
-        "craving", "urge", "desire", "want to smoke", "need a cigarette", "temptation", "nicotine hit",
-        "can't resist", "really want to smoke", "smoke so bad", "need to vape", "need to smoke"
-    ]
+    return CRAVING_EXTENDED_KEYWORDS
 
 def detect_craving(message):
-    msg = message.lower()
-    return any(kw in msg for kw in craving_keywords())
+    return detect_signals(message).craving_extended
 
 def get_chat_history(user_id, limit=10):
     try:
@@ -255,12 +237,12 @@ def augment_prompt(template, context, passages, question):
         question
     ) + follow_up
 
-def generate_response(client, prompt):
+async def generate_response(prompt):
     """Generate a response using the Groq model."""
     logger.info("Inside generate_response function.")
     try:
         logger.info("Attempting to call Groq chat completion.")
-        chat_completion = client.chat.completions.create(
+        response_text = await llm_client.chat_completion(
             messages=[
                 {
                     "role": "user",
@@ -273,8 +255,7 @@ def generate_response(client, prompt):
         )
         logger.info("Groq chat completion call finished.")
         
-        if chat_completion.choices and len(chat_completion.choices) > 0:
-            response_text = chat_completion.choices[0].message.content
+        if response_text is not None:
             logger.info("Successfully extracted response from Groq.")
             return response_text
         else:
@@ -315,7 +296,7 @@ async def query_watsonx(context, message):
                 prompt += f"- {passage['text']} (Source: {passage['source']})\n"
         
         # Generate response using the Groq model
-        response = generate_response(client, prompt)
+        response = await generate_response(prompt)
         
         # Clean up the response
         cleaned_response = clean_response(response)
@@ -554,7 +535,7 @@ async def query_watsonx_voice(context: dict, message: str, conversation_history:
         
         # Generate response using the Groq model
         logger.info("Generating response with Groq model.")
-        response = generate_response(client, prompt)
+        response = await generate_response(prompt)
         logger.info("Response generation complete.")
         
         # Clean up the response
@@ -675,7 +656,7 @@ Assistant Response:"""
     logger.debug(f"Chat Prompt: {prompt[:500]}...") # Log start of prompt
 
     try:
-        raw_response = generate_response(client, prompt)
+        raw_response = await generate_response(prompt)
         logger.info("Received raw response from Groq for chat.")
         logger.debug(f"Raw Chat Response: {raw_response[:500]}...")
 
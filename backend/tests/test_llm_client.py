@@ -0,0 +1,58 @@
+"""
+End-to-end calls through llm_client and its KeyPool against the local LLM
+simulator, served in-process over httpx's ASGI transport.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from groq import AsyncGroq, RateLimitError
+
+import llm_simulator
+from services import llm_client
+from services.llm_keys import KeyPool
+
+MESSAGES = [
+    {"role": "system", "content": "You are a test."},
+    {"role": "user", "content": "one two three"},
+]
+
+
+@pytest.fixture
+def simulator(monkeypatch):
+    monkeypatch.setattr(llm_simulator, "config", llm_simulator.SimulatorConfig(
+        ttft_ms=0, tokens_per_second=0, error_rate=0, rate_limit_rate=0, mode="echo"
+    ))
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=llm_simulator.app))
+    pool = KeyPool(
+        ["sim-key-0001", "sim-key-0002"],
+        lambda key: AsyncGroq(api_key=key, base_url="http://simulator", http_client=http_client, max_retries=0),
+        rate_limit_error=RateLimitError,
+    )
+    monkeypatch.setattr(llm_client, "key_pool", pool)
+    return llm_simulator.config
+
+
+def test_chat_completion(simulator):
+    content = asyncio.run(llm_client.chat_completion(MESSAGES, model="simulated", coalesce=False))
+    assert content == "one two three"
+
+
+def test_stream_chat_completion(simulator):
+    async def collect():
+        return [token async for token in llm_client.stream_chat_completion(MESSAGES, model="simulated")]
+
+    tokens = asyncio.run(collect())
+    assert "".join(tokens) == "one two three"
+    assert len(tokens) == 3
+
+
+def test_chat_completion_retries_server_errors(simulator, monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BACKOFF_SECONDS", 0)
+    rolls = iter([0.0, 0.99])
+    # The first request gets a 503, the retry succeeds
+    simulator.error_rate = 0.5
+    monkeypatch.setattr(llm_simulator.random, "random", lambda: next(rolls))
+    content = asyncio.run(llm_client.chat_completion(MESSAGES, model="simulated", coalesce=False))
+    assert content == "one two three"
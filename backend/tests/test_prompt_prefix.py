@@ -0,0 +1,79 @@
+"""
+The system message is the cacheable prompt prefix: it must not change with
+the user, their context or the document, or every request misses the cache.
+"""
+
+import asyncio
+
+from services import groq_service
+
+USERS = [
+    {
+        "user_id": "alice",
+        "days_smoke_free": 3,
+        "cravings": 8,
+        "triggers": ["coffee", "stress"],
+        "mood": "anxious",
+        "craving_stats": {"total": 12, "average_intensity": 6.5, "last_24h": 3},
+    },
+    {
+        "user_id": "bob",
+        "days_smoke_free": 120,
+        "cravings": 2,
+        "goals": ["run a 10k"],
+        "medications": ["varenicline"],
+        "location": "work",
+    },
+]
+HISTORIES = [
+    [{"sender": "user", "text": "I want a cigarette"}, {"sender": "bot", "text": "Try the 4 D's."}],
+    [],
+]
+MESSAGES = ["I have a strong craving right now", "How do I handle stress at work?"]
+
+
+def assert_same_prefix(prompts):
+    prefixes = [messages[0] for messages in prompts]
+    assert all(prefix["role"] == "system" for prefix in prefixes)
+    assert len({prefix["content"].encode("utf-8") for prefix in prefixes}) == 1
+    # The per-user parts go after the prefix
+    assert prompts[0][1:] != prompts[1][1:]
+
+
+def test_chat_prefix_is_identical_across_users():
+    passages = [[{"text": "Cravings pass in minutes.", "source": "CDC"}], []]
+    prompts = [
+        groq_service.prepare_prompt(context, message, history, passage)
+        for context, message, history, passage in zip(USERS, MESSAGES, HISTORIES, passages)
+    ]
+    assert_same_prefix(prompts)
+    assert prompts[0][0]["content"] == groq_service.CHAT_SYSTEM_PROMPT
+
+
+def test_voice_prefix_is_identical_across_users():
+    prompts = [
+        groq_service.prepare_voice_chat_prompt(context, message, history)
+        for context, message, history in zip(USERS, MESSAGES, HISTORIES)
+    ]
+    assert_same_prefix(prompts)
+    assert prompts[0][0]["content"] == groq_service.VOICE_SYSTEM_PROMPT
+
+
+def test_document_chat_prefix_is_identical_across_documents(monkeypatch):
+    captured = []
+
+    async def fake_generate_response(messages, *args, **kwargs):
+        captured.append(messages)
+        return "answer"
+
+    monkeypatch.setattr(groq_service, "MODEL_OK", True)
+    monkeypatch.setattr(groq_service, "generate_response", fake_generate_response)
+    documents = [
+        ("Hemoglobin: 13.5 g/dL\nCotinine: positive", "Is my cotinine high?", HISTORIES[0], "Summary: smoker"),
+        ("Chest X-ray: clear lungs", "Are my lungs okay?", [], ""),
+    ]
+    for document_text, question, history, analysis_context in documents:
+        asyncio.run(groq_service.chat_with_document_groq(document_text, question, history, analysis_context))
+
+    assert_same_prefix(captured)
+    assert captured[0][0]["content"] == groq_service.DOCUMENT_CHAT_SYSTEM_PROMPT